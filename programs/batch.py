@@ -0,0 +1,241 @@
+import os
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from tf.core.helpers import unexpanduser
+
+from config import VOLUME_INFO, Config
+from hocr import Hocr, PAGE
+from metrics import Metrics
+from tfFromTsv import convert
+
+
+def runVolume(
+    volume,
+    logFile,
+    stream=False,
+    cache=False,
+    profile=None,
+    base=None,
+    volumeInfo=None,
+):
+    """Run the full conversion of one volume, from HOCR to TF.
+
+    All output of the conversion, including error tracebacks, goes to a log file.
+    Errors do not propagate: they are reported in the result.
+
+    Parameters
+    ----------
+    volume: integer
+        The volume to convert.
+    logFile: string
+        Path of the log file.
+    stream: boolean, optional False
+        Whether to produce the word file by `Hocr.stream()` or stage by stage.
+    cache: boolean, optional False
+        Whether to use the stage cache of `Hocr`.
+    profile: string, optional None
+        Profiler for the stages, see `metrics.Metrics`.
+    base: string, optional None
+        See `config.Config`.
+    volumeInfo: dict, optional None
+        The configuration of the volume. A worker process only knows the volumes
+        in `config.VOLUME_INFO` as it is in the source, not the ones added later,
+        such as synthetic volumes; so the batch driver passes it on.
+
+    Returns
+    -------
+    dict
+        The volume, whether the conversion succeeded, the error if not,
+        the time it took, the number of pages and words,
+        and the file with the metrics of the stages.
+    """
+    result = dict(volume=volume, ok=False, error="", seconds=0, pages=0, words=0)
+    start = time.perf_counter()
+
+    if volumeInfo is not None:
+        VOLUME_INFO[volume] = volumeInfo
+
+    sys.stdout.flush()
+    sys.stderr.flush()
+    saved = (os.dup(1), os.dup(2))
+
+    with open(logFile, "w") as lh:
+        os.dup2(lh.fileno(), 1)
+        os.dup2(lh.fileno(), 2)
+        metrics = Metrics(
+            Config(base=base).volumeName(volume), profile=profile, base=base
+        )
+        try:
+            H = Hocr(volume, cache=cache, metrics=metrics, base=base)
+            if not H.good:
+                raise ValueError(f"No configuration for volume {volume}")
+            if stream:
+                H.stream()
+            else:
+                H.simplify()
+                H.read()
+                H.wordify()
+                H.clean()
+                H.write()
+            result["pages"] = H.amount[PAGE]
+            result["words"] = H.cleanCounts[3]
+            if not convert(volume, metrics=metrics, base=base):
+                raise ValueError("Conversion to TF failed")
+            result["ok"] = True
+        except Exception as e:
+            traceback.print_exc()
+            result["error"] = f"{type(e).__name__}: {e}"
+        finally:
+            result["metrics"] = metrics.save()
+            sys.stdout.flush()
+            sys.stderr.flush()
+            os.dup2(saved[0], 1)
+            os.dup2(saved[1], 2)
+            os.close(saved[0])
+            os.close(saved[1])
+
+    result["seconds"] = time.perf_counter() - start
+    return result
+
+
+def batch(
+    volumes=None, processes=None, stream=False, cache=False, profile=None, base=None
+):
+    """Convert several volumes, each in its own worker process.
+
+    Every volume is converted in a fresh process, with its output in
+    `_local/logs/daghregisterNNN.log`.
+    A volume that fails does not stop the others.
+    At the end a summary table is shown and saved as `_local/logs/batch.tsv`.
+
+    Parameters
+    ----------
+    volumes: iterable of integer, optional None
+        The volumes to convert; by default all volumes in the configuration.
+    processes: integer, optional None
+        The number of worker processes; by default one per cpu.
+    stream, cache, profile, base:
+        See `runVolume()`.
+
+    Returns
+    -------
+    dict
+        The results of `runVolume()`, keyed by volume.
+    """
+    C = Config(base=base)
+    volumes = sorted(C.volumeInfo if volumes is None else volumes)
+    if not volumes:
+        print("No volumes to convert")
+        return {}
+
+    logDir = f"{C.local}/logs"
+    os.makedirs(logDir, exist_ok=True)
+    nProcs = min(len(volumes), processes or os.cpu_count())
+
+    print(
+        f"Converting {len(volumes)} volumes by {nProcs} processes,"
+        f" logs in {unexpanduser(logDir)}"
+    )
+
+    results = {}
+    start = time.perf_counter()
+
+    with ProcessPoolExecutor(max_workers=nProcs, max_tasks_per_child=1) as executor:
+        futures = {
+            executor.submit(
+                runVolume,
+                volume,
+                f"{logDir}/{C.volumeName(volume)}.log",
+                stream,
+                cache,
+                profile,
+                base,
+                C.volumeInfo.get(volume, None),
+            ): volume
+            for volume in volumes
+        }
+        for future in as_completed(futures):
+            volume = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                # the worker process itself has died
+                result = dict(
+                    volume=volume,
+                    ok=False,
+                    error=f"worker failed: {type(e).__name__}: {e}",
+                    seconds=0,
+                    pages=0,
+                    words=0,
+                )
+            results[volume] = result
+            status = "OK" if result["ok"] else f"FAILED ({result['error']})"
+            print(f"\tvolume {volume:>3}: {status} in {result['seconds']:.1f}s")
+
+    batchReport(results, time.perf_counter() - start, logDir)
+    return results
+
+
+def rate(n, seconds):
+    return n / seconds if seconds else 0
+
+
+def batchReport(results, seconds, logDir):
+    header = ("volume", "status", "seconds", "pages", "words", "pages/s", "words/s")
+    rows = []
+    for volume in sorted(results):
+        r = results[volume]
+        rows.append(
+            (
+                volume,
+                "OK" if r["ok"] else "FAILED",
+                r["seconds"],
+                r["pages"],
+                r["words"],
+                rate(r["pages"], r["seconds"]),
+                rate(r["words"], r["seconds"]),
+            )
+        )
+
+    good = [r for r in results.values() if r["ok"]]
+    pages = sum(r["pages"] for r in good)
+    words = sum(r["words"] for r in good)
+    total = (
+        "all",
+        f"{len(good)}/{len(results)} OK",
+        seconds,
+        pages,
+        words,
+        rate(pages, seconds),
+        rate(words, seconds),
+    )
+
+    print(
+        f"{header[0]:>6} {header[1]:<10} {header[2]:>8} {header[3]:>7}"
+        f" {header[4]:>9} {header[5]:>8} {header[6]:>9}"
+    )
+    for (volume, status, secs, nPages, nWords, pRate, wRate) in rows + [total]:
+        print(
+            f"{volume:>6} {status:<10} {secs:>8.1f} {nPages:>7} {nWords:>9}"
+            f" {pRate:>8.1f} {wRate:>9.0f}"
+        )
+    for volume in sorted(results):
+        if not results[volume]["ok"]:
+            print(f"volume {volume}: {results[volume]['error']}")
+
+    with open(f"{logDir}/batch.tsv", "w") as fh:
+        fh.write("\t".join(header + ("error",)) + "\n")
+        for row in rows:
+            (volume, status, secs, nPages, nWords, pRate, wRate) = row
+            error = results[volume]["error"]
+            fh.write(
+                f"{volume}\t{status}\t{secs:.3f}\t{nPages}\t{nWords}"
+                f"\t{pRate:.3f}\t{wRate:.3f}\t{error}\n"
+            )
+
+
+if __name__ == "__main__":
+    batch([int(v) for v in sys.argv[1:]] or None)
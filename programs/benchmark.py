@@ -0,0 +1,329 @@
+import os
+import io
+import sys
+import json
+import time
+import platform
+import tempfile
+import collections
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
+
+from config import VOLUME_INFO
+from diagnostics import Diagnostics
+from hocr import Hocr, tokenize, tokenizeGeneric, tsvLines
+from legalgrams import Gram
+from metrics import Metrics, peakRss
+from synthetic import SYNTHETIC_VOLUME, generate, makeVolume
+from tfFromTsv import convert, loadTf
+
+
+SIZES = (10, 500, 5000)
+
+STAGES = ("simplify", "read", "wordify", "clean", "write", "convert")
+
+# a stage counts as a regression if its throughput drops below this fraction
+# of the baseline
+
+TOLERANCE = 0.8
+
+BASELINE_FILE = f"{os.path.dirname(os.path.abspath(__file__))}/benchmark.json"
+
+# the words of volume 4 after the post-OCR splitting, for `benchmarkLegality()`
+
+WORD_FILE = f"{os.path.dirname(os.path.abspath(__file__))}/../postocr/wordx.tsv"
+
+# the order in which the notebook declares the legal consonant combinations:
+# (kind, n), the trigrams at a side after the bigrams at that side
+
+LEGALITY_STEPS = ((False, 2), (False, 3), (True, 2), (True, 3))
+LEGALITY_LIMIT = {2: 10, 3: 10}
+
+
+def measure(pages, seed=1):
+    """Run the pipeline on a synthetic volume and measure every stage.
+
+    The volume is made in a temporary directory, which is removed afterwards.
+
+    Returns
+    -------
+    dict
+        Keyed by stage: the number of items, wall and cpu time,
+        items per second and peak memory.
+    """
+    volume = SYNTHETIC_VOLUME
+
+    with tempfile.TemporaryDirectory() as base:
+        makeVolume(base, pages, seed=seed)
+        metrics = Metrics(f"benchmark{pages}", base=base)
+
+        with redirect_stdout(io.StringIO()):
+            H = Hocr(volume, metrics=metrics, base=base)
+            H.simplify()
+            H.read()
+            H.wordify()
+            H.clean()
+            H.write()
+            convert(volume, metrics=metrics, base=base)
+
+    return {
+        r["stage"]: {k: r[k] for k in ("items", "wall", "cpu", "itemsPerSecond", "peakRss")}
+        for r in metrics.stages
+        if r["stage"] in STAGES
+    }
+
+
+def benchmark(sizes=SIZES, seed=1, update=False):
+    """Measure the throughput of the stages on synthetic volumes of several sizes.
+
+    The results are compared with the stored baseline in `benchmark.json`.
+
+    Parameters
+    ----------
+    sizes: iterable of integer, optional SIZES
+        The numbers of pages of the synthetic volumes.
+    seed: integer, optional 1
+        Seed for generating the volumes.
+    update: boolean, optional False
+        Whether to store the results as the new baseline.
+
+    Returns
+    -------
+    dict
+        The results of `measure()`, keyed by size.
+    """
+    results = {}
+
+    for pages in sizes:
+        print(f"Benchmarking {pages} pages ...")
+        results[str(pages)] = measure(pages, seed=seed)
+
+    baseline = {}
+    if os.path.exists(BASELINE_FILE):
+        with open(BASELINE_FILE) as fh:
+            baseline = json.load(fh)
+
+    benchmarkReport(results, baseline.get("sizes", {}))
+
+    if update:
+        sizeResults = baseline.get("sizes", {}) | results
+        with open(BASELINE_FILE, "w") as fh:
+            json.dump(
+                dict(
+                    python=platform.python_version(),
+                    platform=platform.platform(),
+                    cpus=os.cpu_count(),
+                    seed=seed,
+                    sizes=sizeResults,
+                ),
+                fh,
+                indent=1,
+            )
+        print(f"Baseline updated in {BASELINE_FILE}")
+
+    return results
+
+
+def benchmarkReport(results, baseline):
+    regressions = []
+
+    for (size, stages) in results.items():
+        print(f"{size} pages:")
+        print(
+            f"\t{'stage':<10} {'items':>9} {'wall':>8} {'items/s':>10}"
+            f" {'baseline':>10} {'ratio':>6}"
+        )
+        for stage in STAGES:
+            r = stages.get(stage, None)
+            if r is None:
+                continue
+            base = baseline.get(size, {}).get(stage, {}).get("itemsPerSecond", None)
+            perSec = r["itemsPerSecond"]
+            ratio = perSec / base if base and perSec else None
+            flag = ""
+            if ratio is not None and ratio < TOLERANCE:
+                flag = " SLOWER"
+                regressions.append((size, stage, ratio))
+            print(
+                f"\t{stage:<10} {r['items']:>9} {r['wall']:>8.3f} {perSec:>10.0f}"
+                f" {'' if base is None else f'{base:.0f}':>10}"
+                f" {'' if ratio is None else f'{ratio:.2f}':>6}{flag}"
+            )
+
+    if regressions:
+        print(f"{len(regressions)} stages slower than {TOLERANCE:.0%} of the baseline")
+    else:
+        print("No regressions with respect to the baseline")
+
+
+def benchmarkTokenizer(pages=500, seed=1):
+    """Measure the speed of splitting HOCR lines, in lines per second.
+
+    On the lines of a synthetic source, this compares splitting by a regular
+    expression per part (as simplify did before) with the single pass
+    tokenizer, and the complete simplification in both ways.
+    """
+    with tempfile.TemporaryDirectory() as base:
+        source = f"{base}/synthetic.html"
+        generate(source, pages, seed=seed)
+        with open(source) as fh:
+            lines = [line.strip() for line in fh]
+
+    nLines = len(lines)
+    print(f"{nLines} lines in {pages} pages")
+
+    for (label, tokenizer) in (
+        ("one regex per part", tokenizeGeneric),
+        ("single pass", tokenize),
+    ):
+        start = time.perf_counter()
+        for line in lines:
+            tokenizer(line)
+        seconds = time.perf_counter() - start
+        print(f"\t{label:<20}: {nLines / seconds:>10.0f} lines/s")
+
+    for (label, fast) in (("simplify before", False), ("simplify after", True)):
+        start = time.perf_counter()
+        for _ in tsvLines(lines, [], Diagnostics("unmatched lines"), fast=fast):
+            pass
+        seconds = time.perf_counter() - start
+        print(f"\t{label:<20}: {nLines / seconds:>10.0f} lines/s")
+
+
+# the ways to load the TF of a volume in `benchmarkLoad()`, with the arguments
+# of `loadTf()`
+
+LOAD_MODES = {
+    "everything": dict(),
+    "letters only": dict(features=["letters"]),
+    "lazy": dict(lazy=True),
+}
+
+
+def measureLoad(base, mode, volumeInfo):
+    """Load the TF of the synthetic volume and use its words.
+
+    Meant to run in a fresh process, so that the memory is that of this load only.
+    That process does not know the synthetic volume yet, hence `volumeInfo`.
+
+    Returns
+    -------
+    tuple
+        The wall time, the growth of the peak memory, and the loaded node features.
+    """
+    VOLUME_INFO[SYNTHETIC_VOLUME] = volumeInfo
+    before = peakRss()
+    start = time.perf_counter()
+    with redirect_stdout(io.StringIO()):
+        TF = loadTf(SYNTHETIC_VOLUME, silent=True, base=base, **LOAD_MODES[mode])
+    TF.api.F.letters.freqList()
+    wall = time.perf_counter() - start
+    return (wall, peakRss() - before, TF.api.Fall())
+
+
+def benchmarkLoad(pages=500, seed=1, runs=3):
+    """Measure the startup time and memory of loading TF in the `LOAD_MODES`.
+
+    The TF of a synthetic volume is loaded once to let Text-Fabric compile it;
+    then every mode loads it in a fresh process and counts the words.
+    The best of a few runs is shown.
+    """
+    with tempfile.TemporaryDirectory() as base:
+        makeVolume(base, pages, seed=seed)
+        with redirect_stdout(io.StringIO()):
+            Hocr(SYNTHETIC_VOLUME, base=base).stream()
+            convert(SYNTHETIC_VOLUME, base=base)
+            loadTf(SYNTHETIC_VOLUME, silent=True, base=base)
+
+        volumeInfo = VOLUME_INFO[SYNTHETIC_VOLUME]
+        print(f"Loading TF of {pages} pages, best of {runs}:")
+        print(f"\t{'mode':<14} {'wall':>8} {'memory':>10}  features")
+        for mode in LOAD_MODES:
+            results = []
+            for _ in range(runs):
+                with ProcessPoolExecutor(max_workers=1, max_tasks_per_child=1) as ex:
+                    results.append(ex.submit(measureLoad, base, mode, volumeInfo).result())
+            wall = min(r[0] for r in results)
+            memory = min(r[1] for r in results)
+            features = results[0][2]
+            print(
+                f"\t{mode:<14} {wall:>7.3f}s {memory / 1024 / 1024:>7.1f} MB"
+                f"  {len(features)}: {', '.join(features)}"
+            )
+
+
+def legalitySpec(G, kind, n):
+    """A legality declaration for all consonant combinations of a corpus.
+
+    In turn, a main part gets `+` or `-`, with every other one of its other parts,
+    so that the declaration has legal and illegal combinations of every kind.
+    """
+    others = collections.defaultdict(set)
+    for (main, other) in G.getCombis(kind, n, deliver=True).values():
+        others[main].add(other)
+    return "\n".join(
+        f"{main} {'+-'[i % 2]}{''.join(sorted(theseOthers)[::2])}"
+        for (i, (main, theseOthers)) in enumerate(sorted(others.items()))
+    )
+
+
+def benchmarkLegality(wordFile=WORD_FILE, runs=3):
+    """Measure the legality workflow of the post-OCR notebook, in seconds.
+
+    On the words of a word file (page, line, word), this measures making the
+    grams once, and then the steps that are done again after every edit of
+    a legality declaration: showing the consonant combinations, legalizing them,
+    and computing the legal grams and the legality of the words.
+    The declarations are made from the combinations themselves,
+    see `legalitySpec()`. The best of several runs counts.
+    """
+    with open(wordFile) as fh:
+        next(fh)
+        words = [line.rstrip("\n").split("\t")[2] for line in fh]
+
+    with redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        G = Gram(words)
+        G.getGrams()
+        gramSeconds = time.perf_counter() - start
+
+        specs = {}
+        for (kind, n) in LEGALITY_STEPS:
+            specs[(kind, n)] = legalitySpec(G, kind, n)
+            G.legalizeCombis(kind, n, specs[(kind, n)])
+
+        steps = (
+            ("combis", lambda: [G.getCombis(*step) for step in LEGALITY_STEPS]),
+            (
+                "legalize",
+                lambda: [G.legalizeCombis(*step, specs[step]) for step in LEGALITY_STEPS],
+            ),
+            ("legal grams", lambda: G.getLegalGrams(LEGALITY_LIMIT)),
+            ("legal words", G.getLegalWords),
+        )
+        timings = collections.defaultdict(list)
+        for _ in range(runs):
+            for (label, step) in steps:
+                start = time.perf_counter()
+                step()
+                timings[label].append(time.perf_counter() - start)
+
+    print(f"{len(G.wordOccs)} words in {len(words)} occurrences")
+    print(f"\t{'grams':<12}: {gramSeconds:>7.3f} s (once)")
+    for (label, seconds) in timings.items():
+        print(f"\t{label:<12}: {min(seconds):>7.3f} s")
+    total = sum(min(seconds) for seconds in timings.values())
+    print(f"\t{'per edit':<12}: {total:>7.3f} s")
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    if "--load" in args:
+        sizes = [int(a) for a in args if a != "--load"]
+        benchmarkLoad(*sizes[0:1])
+    elif "--legality" in args:
+        benchmarkLegality()
+    else:
+        update = "--update" in args
+        sizes = [int(a) for a in args if a != "--update"] or SIZES
+        benchmark(sizes, update=update)
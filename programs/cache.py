@@ -0,0 +1,138 @@
+import os
+import gzip
+import pickle
+import hashlib
+
+from tf.core.helpers import unexpanduser
+
+
+# increase this when the results of the stages change for the same inputs,
+# so that all cached results become invalid
+
+CACHE_VERSION = 4
+
+CACHE_COMPRESS = 2
+
+CHUNK_SIZE = 1 << 20
+
+
+def stageKey(*inputs):
+    """Compute a key from the inputs of a stage.
+
+    The inputs are values with a deterministic representation,
+    such as numbers, strings, and (nested) tuples, lists and dicts of them,
+    or keys of earlier stages.
+    """
+    return hashlib.sha1(repr((CACHE_VERSION, inputs)).encode("utf8")).hexdigest()
+
+
+class StageCache:
+    """Persistent store of the results of pipeline stages.
+
+    The results of a stage are stored under a key that is a hash of the inputs
+    of that stage: the contents of input files, relevant configuration values,
+    and the keys of the stages it depends on.
+    A stage with the same key as a stored result does not have to be run again,
+    its result can be loaded.
+
+    All lookups are recorded, see `report()`.
+    """
+
+    def __init__(self, cacheDir):
+        self.cacheDir = cacheDir
+        self.hashFile = f"{cacheDir}/files.tsv"
+        self.log = {}
+
+    def stageFile(self, stage):
+        return f"{self.cacheDir}/{stage}.pickle.gz"
+
+    def fileHash(self, path):
+        """Hash the contents of a file.
+
+        Hashes are remembered together with the size and modification time of the
+        file, and are only recomputed when one of those changes.
+        """
+        info = os.stat(path)
+        stamp = f"{info.st_size}\t{info.st_mtime_ns}"
+        hashes = {}
+
+        if os.path.exists(self.hashFile):
+            with open(self.hashFile) as fh:
+                for line in fh:
+                    (p, s1, s2, h) = line.rstrip("\n").split("\t")
+                    hashes[p] = (f"{s1}\t{s2}", h)
+
+        if path in hashes and hashes[path][0] == stamp:
+            return hashes[path][1]
+
+        sha = hashlib.sha1()
+        with open(path, "rb") as fh:
+            while True:
+                chunk = fh.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                sha.update(chunk)
+        h = sha.hexdigest()
+        hashes[path] = (stamp, h)
+
+        os.makedirs(self.cacheDir, exist_ok=True)
+        with open(self.hashFile, "w") as fh:
+            for (p, (s, ph)) in sorted(hashes.items()):
+                fh.write(f"{p}\t{s}\t{ph}\n")
+
+        return h
+
+    def load(self, stage, key):
+        """Load the stored result of a stage, if it has the given key.
+
+        Returns
+        -------
+        dict or None
+            The result, or None if there is no result for this key.
+        """
+        stageFile = self.stageFile(stage)
+
+        data = None
+        if os.path.exists(stageFile):
+            with gzip.open(stageFile, "rb") as fh:
+                (storedKey, result) = pickle.load(fh)
+            if storedKey == key:
+                data = result
+
+        self.log.pop(stage, None)
+        self.log[stage] = "miss" if data is None else "hit"
+        return data
+
+    def save(self, stage, key, data):
+        os.makedirs(self.cacheDir, exist_ok=True)
+        with gzip.open(self.stageFile(stage), "wb", compresslevel=CACHE_COMPRESS) as fh:
+            pickle.dump((key, data), fh, protocol=pickle.HIGHEST_PROTOCOL)
+        if self.log.get(stage, None) != "hit":
+            self.log[stage] = "miss, stored"
+
+    def invalidate(self, stage=None):
+        """Remove stored results, of one stage or of all stages."""
+        if not os.path.exists(self.cacheDir):
+            return
+        stages = (
+            [stage]
+            if stage is not None
+            else [
+                f.removesuffix(".pickle.gz")
+                for f in os.listdir(self.cacheDir)
+                if f.endswith(".pickle.gz")
+            ]
+        )
+        for stg in stages:
+            stageFile = self.stageFile(stg)
+            if os.path.exists(stageFile):
+                os.remove(stageFile)
+                print(f"Invalidated cached {stg}")
+            self.log[stg] = "invalidated"
+
+    def report(self):
+        print(f"Stage cache in {unexpanduser(self.cacheDir)}")
+        if not self.log:
+            print("\tno stages looked up")
+        for (stage, status) in self.log.items():
+            print(f"\t{stage:<12}: {status}")
@@ -0,0 +1,273 @@
+from array import array
+from bisect import bisect_right
+from itertools import chain, islice, repeat
+
+
+# confidences are stored as integers: the confidence times CONFIDENCE_SCALE;
+# HOCR gives them with at most 6 decimals
+
+CONFIDENCE_SCALE = 10**6
+
+# name and array typecode of the numerical fields of a character record that
+# change from record to record; an array of small numbers is made wider
+# when a number does not fit, see `widened()`
+
+FIELDS = (
+    ("word", "B"),
+    ("char", "b"),
+    ("confidence", "I"),
+    ("left", "H"),
+    ("top", "H"),
+    ("right", "H"),
+    ("bottom", "H"),
+)
+
+WIDER = {"b": "h", "B": "h", "h": "i", "i": "q", "H": "I", "I": "q"}
+
+# name and slope of the numerical fields that are the same, or go up by one,
+# over long stretches of records, see `Runs`
+
+RUN_FIELDS = (
+    ("i", 1),
+    ("page", 0),
+    ("area", 0),
+    ("para", 0),
+    ("line", 0),
+    ("offsets", 1),
+)
+
+
+def widened(column, value):
+    """A copy of an array with a typecode that can also hold value."""
+    typecode = WIDER[column.typecode]
+    while True:
+        try:
+            array(typecode, [value])
+            break
+        except OverflowError:
+            typecode = WIDER[typecode]
+    column = array(typecode, column)
+    column.append(value)
+    return column
+
+
+class Runs:
+    """A column of integers that only store where they deviate from a line.
+
+    The value at position `j` is `values[k] + slope * j`, where `k` is the last run
+    that starts at or before `j`. With slope 0 these are runs of equal values,
+    like the page numbers of characters; with slope 1 these are runs of values that
+    go up by one, like the line numbers in the TSV file of the characters
+    of a word.
+
+    Parameters
+    ----------
+    slope: integer
+        0 or 1
+    """
+
+    def __init__(self, slope):
+        self.slope = slope
+        self.starts = array("I")
+        self.values = array("i")
+        self.last = None
+        self.n = 0
+
+    def append(self, value):
+        n = self.n
+        self.n = n + 1
+        value -= self.slope * n
+        if value != self.last:
+            self.last = value
+            self.starts.append(n)
+            try:
+                self.values.append(value)
+            except OverflowError:
+                self.values = widened(self.values, value)
+
+    def changes(self, start, end):
+        """The positions after start and before end that start a new run.
+
+        With slope 0 these are the positions where the value differs from
+        the one before.
+        """
+        starts = self.starts
+        return starts[bisect_right(starts, start) : bisect_right(starts, end - 1)]
+
+    def at(self, positions):
+        """The values at a number of positions."""
+        (starts, values, slope) = (self.starts, self.values, self.slope)
+        return [values[bisect_right(starts, j) - 1] + slope * j for j in positions]
+
+    def drop(self, k, shift=0):
+        """Remove the first k values, and add shift to the others."""
+        starts = self.starts
+        values = self.values
+        self.n -= k
+        if not values:
+            return
+        first = bisect_right(starts, k) - 1
+        shift += self.slope * k
+        self.starts = array("I", [0])
+        self.starts.extend(s - k for s in starts[first + 1 :])
+        self.values = array(values.typecode)
+        for v in values[first:]:
+            try:
+                self.values.append(v + shift)
+            except OverflowError:
+                self.values = widened(self.values, v + shift)
+        self.last = self.values[-1]
+
+    def __getitem__(self, j):
+        if j < 0:
+            j += self.n
+        return self.values[bisect_right(self.starts, j) - 1] + self.slope * j
+
+    def __iter__(self):
+        (starts, values, slope) = (self.starts, self.values, self.slope)
+        for (s, e, v) in zip(starts, chain(islice(starts, 1, None), [self.n]), values):
+            if slope:
+                yield from range(v + s, v + e)
+            else:
+                yield from repeat(v, e - s)
+
+    def __len__(self):
+        return self.n
+
+
+class Chars:
+    """Character records of a volume, stored as parallel typed arrays.
+
+    There is an array per field, and the letters of all records are
+    concatenated into one string, which is indexed by offsets.
+    The fields that hardly change from one record to the next (the position in the
+    TSV file, the page, area, paragraph and line, and the offsets of the letters)
+    are kept as `Runs`: only the places where they change are stored.
+    The other fields are kept in arrays of the smallest type that holds them.
+
+    Records can still be retrieved as tuples
+
+        (i, page, area, para, line, word, char, letter, confidence, width)
+
+    by indexing or iterating, but they are not stored that way.
+    This takes about a tenth of the memory of a list of such tuples,
+    of which the boxes (8 bytes per record) and the confidences (4 bytes)
+    are the largest part.
+
+    Confidences are kept as integers, see `CONFIDENCE_SCALE`, so that averages
+    computed from them do not depend on the order of adding them up.
+    """
+
+    def __init__(self):
+        for (name, typecode) in FIELDS:
+            setattr(self, name, array(typecode))
+        for (name, slope) in RUN_FIELDS:
+            setattr(self, name, Runs(slope))
+        self.nLetters = 0
+        self.letters = ""
+        self.pending = []
+
+    def append(self, i, page, area, para, line, word, char, letter, confidence, box):
+        """Add a record; box is the tuple (left, top, right, bottom)."""
+        self.i.append(i)
+        self.page.append(page)
+        self.area.append(area)
+        self.para.append(para)
+        self.line.append(line)
+        try:
+            self.word.append(word)
+        except OverflowError:
+            self.word = widened(self.word, word)
+        try:
+            self.char.append(char)
+        except OverflowError:
+            self.char = widened(self.char, char)
+        self.confidence.append(round(confidence * CONFIDENCE_SCALE))
+        self.left.append(box[0])
+        self.top.append(box[1])
+        self.right.append(box[2])
+        self.bottom.append(box[3])
+        self.offsets.append(self.nLetters)
+        self.nLetters += len(letter)
+        self.pending.append(letter)
+
+    def finish(self):
+        """Concatenate the letters that have been appended so far."""
+        if self.pending:
+            self.letters += "".join(self.pending)
+            self.pending = []
+
+    def offset(self, j):
+        """Where the letter of record j starts in the letter string."""
+        return self.nLetters if j == len(self) else self.offsets[j]
+
+    def drop(self, k):
+        """Remove the first k records."""
+        self.finish()
+        base = self.offset(k)
+        for (name, typecode) in FIELDS:
+            del getattr(self, name)[0:k]
+        for (name, slope) in RUN_FIELDS:
+            getattr(self, name).drop(k, shift=-base if name == "offsets" else 0)
+        self.letters = self.letters[base:]
+        self.nLetters -= base
+
+    def letter(self, j):
+        if self.pending:
+            self.finish()
+        return self.letters[self.offset(j) : self.offset(j + 1)]
+
+    def __len__(self):
+        return len(self.confidence)
+
+    def __getitem__(self, j):
+        if j < 0:
+            j += len(self)
+        return (
+            self.i[j],
+            self.page[j],
+            self.area[j],
+            self.para[j],
+            self.line[j],
+            self.word[j],
+            self.char[j],
+            self.letter(j),
+            self.confidence[j] / CONFIDENCE_SCALE,
+            self.right[j] - self.left[j],
+        )
+
+    def __iter__(self):
+        self.finish()
+        letters = self.letters
+        scale = CONFIDENCE_SCALE
+
+        for (i, page, area, para, line, word, char, confidence, b, e, l, r) in zip(
+            self.i,
+            self.page,
+            self.area,
+            self.para,
+            self.line,
+            self.word,
+            self.char,
+            self.confidence,
+            self.offsets,
+            chain(islice(self.offsets, 1, None), [self.nLetters]),
+            self.left,
+            self.right,
+        ):
+            yield (
+                i,
+                page,
+                area,
+                para,
+                line,
+                word,
+                char,
+                letters[b:e],
+                confidence / scale,
+                r - l,
+            )
+
+    def __getstate__(self):
+        self.finish()
+        return self.__dict__
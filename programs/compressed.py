@@ -0,0 +1,146 @@
+import os
+import io
+import bz2
+import gzip
+import lzma
+import queue
+import threading
+
+
+# compressed files are recognized by their extension
+
+EXTENSIONS = (".gz", ".bz2", ".xz", ".zst")
+
+# the background reader hands over the lines in batches of about this many bytes,
+# and keeps at most this many batches ahead of the consumer
+
+CHUNK_SIZE = 1 << 20
+PREFETCH_DEPTH = 8
+
+
+def compression(path):
+    """The compression extension of a file, or None if it is not compressed."""
+    for ext in EXTENSIONS:
+        if path.endswith(ext):
+            return ext
+    return None
+
+
+def findSource(path):
+    """Find a file, possibly in compressed form.
+
+    Parameters
+    ----------
+    path: string
+        The path of the uncompressed file.
+
+    Returns
+    -------
+    string
+        The path itself if it exists, otherwise the first existing path
+        with a compression extension appended. If none exists, the path itself.
+    """
+    if os.path.exists(path):
+        return path
+    for ext in EXTENSIONS:
+        if os.path.exists(f"{path}{ext}"):
+            return f"{path}{ext}"
+    return path
+
+
+def openText(path, prefetch=False):
+    """Open a text file for reading, decompressing it on the fly if needed.
+
+    The kind of compression follows from the extension: gzip, bzip2 and xz are
+    supported out of the box, zstandard needs the `zstandard` package.
+
+    Parameters
+    ----------
+    path: string
+        The file to open.
+    prefetch: boolean, optional False
+        If True, the file is read (and decompressed) in a background thread,
+        ahead of the consumer. The result can only be iterated over.
+
+    Returns
+    -------
+    object
+        A file handle, or a `Prefetch` object; both are context managers.
+    """
+    ext = compression(path)
+
+    if ext is None:
+        fh = open(path)
+    elif ext == ".gz":
+        fh = gzip.open(path, "rt")
+    elif ext == ".bz2":
+        fh = bz2.open(path, "rt")
+    elif ext == ".xz":
+        fh = lzma.open(path, "rt")
+    else:
+        try:
+            import zstandard
+        except ImportError:
+            raise ImportError(
+                f"Reading {path} needs the zstandard package: pip install zstandard"
+            )
+        fh = io.TextIOWrapper(
+            zstandard.ZstdDecompressor().stream_reader(open(path, "rb"), closefd=True)
+        )
+
+    return Prefetch(fh) if prefetch else fh
+
+
+class Prefetch:
+    """Iterate over the lines of a file that is read in a background thread.
+
+    Decompression in the standard library releases the GIL, so the
+    decompression of the next part of a file overlaps with the processing of
+    the lines that have been read already.
+    """
+
+    def __init__(self, fh, chunkSize=CHUNK_SIZE, depth=PREFETCH_DEPTH):
+        self.fh = fh
+        self.chunkSize = chunkSize
+        self.queue = queue.Queue(maxsize=depth)
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.fill, daemon=True)
+        self.thread.start()
+
+    def fill(self):
+        try:
+            while True:
+                lines = self.fh.readlines(self.chunkSize)
+                if not self.put(lines) or not lines:
+                    break
+        except Exception as e:
+            self.put(e)
+
+    def put(self, item):
+        while not self.stopped.is_set():
+            try:
+                self.queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def __iter__(self):
+        while True:
+            lines = self.queue.get()
+            if isinstance(lines, Exception):
+                raise lines
+            if not lines:
+                return
+            yield from lines
+
+    def close(self):
+        self.stopped.set()
+        self.thread.join()
+        self.fh.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -45,19 +45,29 @@ MORF_SIZE = 5
 
 
 class Config:
-    def __init__(self):
+    def __init__(self, base=None):
+        """Settings and locations.
+
+        Parameters
+        ----------
+        base: string, optional None
+            Use this directory instead of the clone of the repository
+            for the data: the local files, the TF and the aux and postocr files.
+        """
+        repoDir = REPO_DIR if base is None else base
         self.org = ORG
         self.repo = REPO
-        self.local = LOCAL
+        self.repoDir = repoDir
+        self.local = f"{repoDir}/_local"
         self.name = NAME
         self.thinSpaceThreshold = THIN_SPACE_THRESHOLD
         self.seriesInfo = SERIES_INFO
         self.volumeInfo = VOLUME_INFO
         self.relative = RELATIVE
         self.tfName = TF_NAME
-        self.tfDir = TF_DIR
-        self.auxDir = AUX_DIR
-        self.postDir = POST_DIR
+        self.tfDir = f"{repoDir}/{RELATIVE}/{TF_NAME}"
+        self.auxDir = f"{repoDir}/aux/{TF_NAME}"
+        self.postDir = f"{repoDir}/postocr/{TF_NAME}"
         self.tfVersion = TF_VERSION
         self.morfSize = MORF_SIZE
 
@@ -0,0 +1,225 @@
+import os
+import datetime
+from array import array
+from bisect import bisect_left, bisect_right
+from calendar import monthrange
+from itertools import accumulate, groupby
+
+from tf.core.helpers import unexpanduser
+
+from config import Config
+
+
+# The date index of a volume is saved next to its head line file,
+# with a row for every page that has a date: the page number, the status of the
+# head line analysis, the first and last day (ISO dates), and the range of the
+# words of the page in the word file (first word, number of words).
+
+DATES_FILE = "dates.tsv"
+
+DATES_HEADER = ("page", "ok", "start", "end", "firstword", "nwords")
+
+
+def datesFile(volume, base=None):
+    C = Config(base=base)
+    return f"{C.auxDir}/{C.volumeNameNum(volume)}/{DATES_FILE}"
+
+
+def pageRows(pages):
+    """The ranges of the words per page in the word file.
+
+    Parameters
+    ----------
+    pages: iterable of integer
+        The page numbers of the words, in the order of the word file.
+
+    Returns
+    -------
+    dict
+        Keyed by page number, valued by (first word, number of words).
+    """
+    rows = {}
+    r = 0
+    for (page, ws) in groupby(pages):
+        n = sum(1 for _ in ws)
+        rows[page] = (r, n)
+        r += n
+    return rows
+
+
+def pageInterval(year, month, dayFrom, dayTo):
+    """The first and last day covered by a page, from its head line.
+
+    A last day before the first day is in the next month.
+    Days beyond the end of the month are taken as the last day of the month.
+
+    Returns
+    -------
+    tuple or None
+        Two `datetime.date` objects; None if the data do not form a date.
+    """
+    try:
+        (year, month, dayFrom, dayTo) = (
+            int(x) for x in (year, month, dayFrom, dayTo)
+        )
+        (endYear, endMonth) = (year, month)
+        if dayTo < dayFrom:
+            (endYear, endMonth) = (year + 1, 1) if month == 12 else (year, month + 1)
+        start = datetime.date(year, month, min(dayFrom, monthrange(year, month)[1]))
+        end = datetime.date(
+            endYear, endMonth, min(dayTo, monthrange(endYear, endMonth)[1])
+        )
+    except ValueError:
+        return None
+    return (start, end)
+
+
+def writeDates(path, headData, rows):
+    """Save the date index of a volume.
+
+    Parameters
+    ----------
+    path: string
+        The file to write.
+    headData: list
+        The results of `hocr.Hocr.analyseHeads()`.
+    rows: dict
+        The word ranges per page, see `pageRows()`.
+
+    Returns
+    -------
+    integer
+        The number of pages with a date.
+    """
+    n = 0
+    with open(path, "w") as fh:
+        fh.write("\t".join(DATES_HEADER) + "\n")
+        for (page, side, ok, year, month, dayFrom, dayTo, head) in headData:
+            interval = pageInterval(year, month, dayFrom, dayTo)
+            if interval is None:
+                continue
+            (start, end) = interval
+            (first, nWords) = rows.get(page, (0, 0))
+            fh.write(f"{page}\t{ok}\t{start}\t{end}\t{first}\t{nWords}\n")
+            n += 1
+    return n
+
+
+def toOrdinal(date):
+    """Accept a date as `datetime.date`, ISO string or tuple (year, month, day)."""
+    if isinstance(date, str):
+        date = datetime.date.fromisoformat(date)
+    elif isinstance(date, tuple):
+        date = datetime.date(*date)
+    return date.toordinal()
+
+
+class DateIndex:
+    """Find the pages and words of a volume by date.
+
+    The pages are kept as intervals of days, in arrays sorted by their first day,
+    together with the running maximum of their last days.
+    The pages that overlap a range of dates are then between two positions
+    found by bisection, which takes microseconds.
+
+    Word numbers are positions in the word file, starting at 0, as in
+    `wordboxes.WordBoxes`.
+
+    Parameters
+    ----------
+    path: string
+        The date index, as written by `writeDates()`.
+    """
+
+    def __init__(self, path):
+        entries = []
+        with open(path) as fh:
+            next(fh)
+            for line in fh:
+                (page, ok, start, end, first, nWords) = line.rstrip("\n").split("\t")
+                entries.append(
+                    (
+                        datetime.date.fromisoformat(start).toordinal(),
+                        datetime.date.fromisoformat(end).toordinal(),
+                        int(page),
+                        ok,
+                        int(first),
+                        int(nWords),
+                    )
+                )
+        entries.sort()
+
+        self.starts = array("i", (e[0] for e in entries))
+        self.ends = array("i", (e[1] for e in entries))
+        self.pages = array("i", (e[2] for e in entries))
+        self.ok = [e[3] for e in entries]
+        self.firstWords = array("I", (e[4] for e in entries))
+        self.nWords = array("I", (e[5] for e in entries))
+
+        self.maxEnds = array("i", accumulate(self.ends, max))
+        self.positionOf = {page: k for (k, page) in enumerate(self.pages)}
+
+    def __len__(self):
+        return len(self.pages)
+
+    def positions(self, date1, date2):
+        """The positions in the index of the pages that overlap a range of dates."""
+        (d1, d2) = (toOrdinal(date1), toOrdinal(date2))
+        ends = self.ends
+        lo = bisect_left(self.maxEnds, d1)
+        hi = bisect_right(self.starts, d2)
+        return [k for k in range(lo, hi) if ends[k] >= d1]
+
+    def pagesBetween(self, date1, date2):
+        """The pages that cover a day between two dates, inclusive.
+
+        Returns
+        -------
+        list
+            The page numbers, in increasing order.
+        """
+        pages = self.pages
+        return sorted(pages[k] for k in self.positions(date1, date2))
+
+    def pagesOn(self, date):
+        """The pages that cover a date."""
+        return self.pagesBetween(date, date)
+
+    def wordsOn(self, date):
+        """The words on the pages that cover a date.
+
+        Returns
+        -------
+        list
+            Ranges of word numbers, one per page, in the order of the pages.
+        """
+        (firstWords, nWords) = (self.firstWords, self.nWords)
+        return [
+            range(firstWords[k], firstWords[k] + nWords[k])
+            for k in sorted(self.positions(date, date), key=self.pages.__getitem__)
+        ]
+
+    def datesOf(self, page):
+        """The first and last day covered by a page, or None."""
+        k = self.positionOf.get(page, None)
+        if k is None:
+            return None
+        return (
+            datetime.date.fromordinal(self.starts[k]),
+            datetime.date.fromordinal(self.ends[k]),
+        )
+
+
+def dateIndex(volume, base=None):
+    """Load the date index of a volume, see `DateIndex`.
+
+    Returns
+    -------
+    DateIndex or None
+        None if the volume has no date index (yet).
+    """
+    path = datesFile(volume, base=base)
+    if not os.path.exists(path):
+        print(f"No date index: {unexpanduser(path)}: run the conversion first")
+        return None
+    return DateIndex(path)
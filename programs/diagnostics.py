@@ -0,0 +1,155 @@
+import os
+import random
+import collections
+
+from tf.core.helpers import unexpanduser
+
+
+SAMPLE_SIZE = 100
+
+
+class Diagnostics:
+    """Bounded collection of diagnostic entries.
+
+    Entries are counted per kind, and a fixed-size sample of them is kept:
+    a reservoir sample, in which every entry has the same chance to end up,
+    however many entries there are.
+    All entries can also be written to a file as they come in.
+
+    Collections that are made separately, e.g. in parallel processes, can be
+    merged into one, as if all entries had been added to one collection.
+
+    Parameters
+    ----------
+    name: string
+        What the entries are about.
+    size: integer, optional SAMPLE_SIZE
+        The size of the sample; 0 means: only count.
+    spill: string, optional None
+        If given, a file to which all entries are written, one per line,
+        tab-separated, starting with the kind.
+    seed: integer, optional 1
+        Seed for the sampling, so that runs on the same data show the same sample.
+    """
+
+    def __init__(self, name, size=SAMPLE_SIZE, spill=None, seed=1):
+        self.name = name
+        self.size = size
+        self.spill = spill
+        self.counts = collections.Counter()
+        self.seen = 0
+        self.sample = []
+        self.rnd = random.Random(seed)
+        self.fh = None
+
+        if spill is not None:
+            os.makedirs(os.path.dirname(spill), exist_ok=True)
+            self.fh = open(spill, "w")
+
+    def add(self, kind, entry=None):
+        """Count an entry of a kind, and consider it for the sample.
+
+        Parameters
+        ----------
+        kind: string or integer
+            The kind of entry.
+        entry: tuple, optional None
+            The entry itself; if None, the entry is only counted.
+        """
+        self.counts[kind] += 1
+        if entry is None:
+            return
+
+        seq = self.seen
+        self.seen += 1
+
+        if self.fh is not None:
+            self.fh.write("\t".join(str(x) for x in (kind, *entry)) + "\n")
+
+        sample = self.sample
+        if len(sample) < self.size:
+            sample.append((seq, kind, entry))
+        else:
+            j = self.rnd.randrange(self.seen)
+            if j < self.size:
+                sample[j] = (seq, kind, entry)
+
+    def merge(self, other):
+        """Add the entries of another collection, which come after the current ones.
+
+        The merged sample is again a uniform sample of all entries.
+        A spill file of the other collection is appended to the own spill file
+        and then removed.
+        """
+        self.counts.update(other.counts)
+
+        offset = self.seen
+        mine = list(self.sample)
+        theirs = [(seq + offset, kind, entry) for (seq, kind, entry) in other.sample]
+        self.rnd.shuffle(mine)
+        self.rnd.shuffle(theirs)
+
+        (remMine, remTheirs) = (self.seen, other.seen)
+        merged = []
+        while len(merged) < self.size and remMine + remTheirs:
+            if self.rnd.randrange(remMine + remTheirs) < remMine:
+                merged.append(mine.pop())
+                remMine -= 1
+            else:
+                merged.append(theirs.pop())
+                remTheirs -= 1
+
+        self.sample = merged
+        self.seen += other.seen
+
+        if other.spill is not None:
+            other.close()
+            if self.fh is not None:
+                with open(other.spill) as fh:
+                    for line in fh:
+                        self.fh.write(line)
+            os.remove(other.spill)
+
+    def entries(self):
+        """The sampled entries, in the order in which they were added.
+
+        Returns
+        -------
+        list
+            Tuples `(kind, entry)`.
+        """
+        return [(kind, entry) for (seq, kind, entry) in sorted(self.sample)]
+
+    def close(self):
+        if self.fh is not None:
+            self.fh.close()
+            self.fh = None
+
+    def __len__(self):
+        return sum(self.counts.values())
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state["fh"] = None
+        return state
+
+    def report(self, fmt=None):
+        """Show the number of entries, the counts per kind and the sample.
+
+        Parameters
+        ----------
+        fmt: function, optional None
+            Turns a kind and an entry into a line of text.
+            If None, the sample is not shown.
+        """
+        print(f"{len(self)} {self.name}")
+        if len(self.counts) > 1:
+            for (kind, n) in sorted(self.counts.items(), key=lambda x: (-x[1], x[0])):
+                print(f"\t{n:>7} x {kind}")
+        if fmt is not None and self.sample:
+            if len(self.sample) < self.seen:
+                print(f"a sample of {len(self.sample)}:")
+            for (kind, entry) in self.entries():
+                print(fmt(kind, entry))
+        if self.spill is not None:
+            print(f"all of them are in {unexpanduser(self.spill)}")
@@ -1,7 +1,10 @@
 from itertools import chain
-import collections
+from array import array
+from functools import cached_property
 from math import log2
 
+from wordindex import WordIndex
+
 
 N = 4
 
@@ -12,41 +15,134 @@ class Gram:
         self.words = list(chain.from_iterable((w for w in word.split("┼") if not w.startswith("⁼")) for word in words))
         words = self.words
 
-        wordOccs = collections.defaultdict(list)
+        wordOccs = WordIndex.fromWords(words)
         self.wordOccs = wordOccs
-
-        for (w, word) in enumerate(words):
-            wordOccs[word].append(w)
         print(f"{len(wordOccs)} words in {len(words)} occurrences")
 
     def getGrams(self):
+        """Compute the frequencies of the N-grams and the quality of the words.
+
+        The grams of the words are counted in a sparse word × gram matrix,
+        see `GramMatrix`.
+        The frequency of a gram is the matrix (transposed) times the frequencies
+        of the words, the quality of a word is the matrix times the (log2 of the)
+        frequencies of the grams, times the frequency of the word, divided by
+        its length.
+
+        Sets `GRAM_FREQ` and `WORD_QUALITY`, keyed by gram and word.
+        """
         wordOccs = self.wordOccs
 
-        GRAM = collections.defaultdict(list)
-        self.GRAM = GRAM
+        matrix = GramMatrix(wordOccs.words, N)
+        self.matrix = matrix
+        for name in ("GRAM", "GRAM_INDEX"):
+            self.__dict__.pop(name, None)
+
+        print(f"{len(matrix.grams)} distinct {N}-grams")
+
+        wordFreqs = [freq for (word, freq) in wordOccs.freqs()]
+        gramFreqs = [log2(freq) for freq in matrix.rmatvec(wordFreqs)]
+        self.GRAM_FREQ = dict(zip(matrix.grams, gramFreqs))
+
+        self.WORD_QUALITY = {
+            word: score * freq / len(word)
+            for (word, freq, score) in zip(
+                matrix.words, wordFreqs, matrix.matvec(gramFreqs)
+            )
+        }
+
+    @cached_property
+    def GRAM(self):
+        """The words per gram, made from the matrix when first asked for."""
+        return self.matrix.wordsPerGram()
 
-        GRAM_INDEX = collections.defaultdict(list)
-        self.GRAM_INDEX = GRAM_INDEX
+    @cached_property
+    def GRAM_INDEX(self):
+        """The grams per word, made from the matrix when first asked for."""
+        return self.matrix.gramsPerWord()
 
-        GRAM_FREQ = {}
-        self.GRAM_FREQ = GRAM_FREQ
 
-        WORD_QUALITY = {}
-        self.WORD_QUALITY = WORD_QUALITY
+class GramMatrix:
+    """The grams of words, as a sparse word × gram count matrix.
 
-        for word in wordOccs:
+    The rows are the words, the columns the distinct grams, in the order in which
+    they are first seen. The matrix is kept in compressed sparse rows:
+    the row of word `i` is the sequence of the columns of its grams,
+    from `offsets[i]` to `offsets[i + 1]` in `cols`, in the order of the word.
+    A gram that occurs several times in a word is in its row that many times,
+    which counts it that many times.
+
+    Every word is surrounded by `├` and `┤` first; words of less than
+    `n` characters get grams of half that length.
+
+    Parameters
+    ----------
+    words: list of string
+        The distinct words.
+    n: integer
+        The length of the grams.
+    """
+
+    def __init__(self, words, n):
+        self.words = words
+        gramId = {}
+        self.gramId = gramId
+        offsets = array("I", [0])
+        cols = array("I")
+        half = int(round(n / 2))
+
+        for word in words:
             theWord = f"├{word}┤"
-            useN = int(round(N / 2)) if len(theWord) < N + 2 else N
-            for i in range(len(theWord) - useN + 1):
-                gram = theWord[i:i + useN]
-                GRAM[gram].append(word)
-                GRAM_INDEX[word].append(gram)
+            useN = half if len(theWord) < n + 2 else n
+            cols.extend(
+                gramId.setdefault(theWord[i : i + useN], len(gramId))
+                for i in range(len(theWord) - useN + 1)
+            )
+            offsets.append(len(cols))
+
+        self.grams = list(gramId)
+        self.offsets = offsets
+        self.cols = cols
+
+    def row(self, i):
+        """The columns of the grams of word `i`."""
+        return self.cols[self.offsets[i] : self.offsets[i + 1]]
+
+    def matvec(self, values):
+        """The matrix times a vector of values per gram: a sum per word.
+
+        The values of the grams of a word are added in the order of the word.
+        """
+        cols = self.cols
+        offsets = self.offsets
+        get = values.__getitem__
+        return [
+            sum(map(get, cols[offsets[i] : offsets[i + 1]]))
+            for i in range(len(offsets) - 1)
+        ]
 
-        print(f"{len(GRAM)} distinct {N}-grams")
+    def rmatvec(self, values):
+        """The transposed matrix times a vector of values per word: a sum per gram."""
+        result = [0] * len(self.grams)
+        cols = self.cols
+        offsets = self.offsets
+        for (i, value) in enumerate(values):
+            for c in cols[offsets[i] : offsets[i + 1]]:
+                result[c] += value
+        return result
 
-        for (gram, words) in GRAM.items():
-            GRAM_FREQ[gram] = log2(sum(len(wordOccs[word]) for word in words))
+    def gramsPerWord(self):
+        """A mapping from words to the lists of their grams."""
+        grams = self.grams
+        return {
+            word: [grams[c] for c in self.row(i)] for (i, word) in enumerate(self.words)
+        }
 
-        for (word, occs) in wordOccs.items():
-            freq = len(occs)
-            WORD_QUALITY[word] = sum(GRAM_FREQ[gram] for gram in GRAM_INDEX[word]) * freq / len(word)
+    def wordsPerGram(self):
+        """A mapping from grams to the lists of words that contain them."""
+        result = {gram: [] for gram in self.grams}
+        grams = self.grams
+        for (i, word) in enumerate(self.words):
+            for c in self.row(i):
+                result[grams[c]].append(word)
+        return result
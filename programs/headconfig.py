@@ -8,6 +8,10 @@ lines_004 = """
 499-523: 2
 """
 
+lines_ALL = """
+0: 1
+"""
+
 isRight_004 = """
 True
 """
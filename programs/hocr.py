@@ -1,22 +1,57 @@
 import os
+import io
+import mmap
+import gzip
+import pickle
 import collections
 import re
+import time
+from array import array
+from itertools import compress
+from operator import ne
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
 from textwrap import dedent
 
 from Levenshtein import distance, ratio
 from tf.core.helpers import unexpanduser
 
 from config import Config
+from chars import CONFIDENCE_SCALE, Chars
+from compressed import compression, findSource, openText
+from diagnostics import Diagnostics, SAMPLE_SIZE
+from wordboxes import BoxWriter
+from months import monthMatcher
+from dates import DATES_FILE, pageRows, writeDates
+from cache import StageCache, stageKey
+from metrics import metered
 from headconfig import Config as HeadConfig
 
-wordRe = re.compile(r"""^(.*?)(\W*)$""")
-word2Re = re.compile(r"""^(.*?)(\s*)$""")
-whiteRe = re.compile(r"""^(\S*)(\s*)$""")
+wordsRe = re.compile(r"""(.*?)([^\w\n]*)\n""")
 endElemRe = re.compile(r"""^</(\S+)>$""")
 elemRe = re.compile(r"""^<([^> ]+)""")
 clsRe = re.compile(r'''class="([^"]*)"''')
 titleRe = re.compile(r'''title="([^"]*)"''')
 contentRe = re.compile(r""">([^<]*)</span>""")
+entityRe = re.compile(r"""&(lt|gt|apos|quot|amp);""")
+
+# a line in the regular form: a start tag with only known attributes,
+# whose values contain no brackets, optionally followed by content and an end tag;
+# quotes in element and content are excluded, so that the class and title found
+# here are the same as those that clsRe and titleRe would find
+
+lineRe = re.compile(
+    r"""^<([^> "=]+)((?: (?:class|id|title|lang)="[^"<>]*")*) ?/?>"""
+    r"""(?:([^<"]*)</span>)?$"""
+)
+attrRe = re.compile(r'''([a-z]+)="([^"]*)"''')
+
+# the dominant line: a character with its box and confidence
+
+cinfoRe = re.compile(
+    r"""^<span class="ocrx_cinfo" title="x_bboxes ([^"<>;\s]|[^"<>;\s][^"<>;]*[^"<>;\s]);"""
+    r""" x_conf ([^"<>;\s]|[^"<>;\s][^"<>;]*[^"<>;\s])">([^<]*)</span>$"""
+)
 
 
 PHOTO = "photo"
@@ -41,9 +76,29 @@ clsDef = dict(
     ocrx_cinfo=CHAR,
 )
 
+PAGE_MARK = b'class="ocr_page"'
+
+PACK_VERSION = 4
+PACK_COMPRESS = 2
+
+ENTITIES = {"lt": "<", "gt": ">", "apos": "'", "quot": '"', "amp": "&"}
+
 IGNORE_ELEM = {"html", "head", "title", "meta", "body"}
 CLSLESS_ELEM = {"table", "tr", "td"}
 
+# how the footer Digitized by Google is found, see `cleanWords()`
+
+FOOTER_POSITION = "position"
+FOOTER_DISTANCE = "distance"
+FOOTER_COMPARE = "compare"
+
+# a word can be part of the footer if its bottom is at most FOOTER_BAND times the
+# average word height above the lowest bottom of the page, and if its height is
+# at most FOOTER_SIZE times the average word height
+
+FOOTER_BAND = 1.0
+FOOTER_SIZE = 1.25
+
 MONTH_LAST = {
     1: 31,
     2: 28,
@@ -60,29 +115,782 @@ MONTH_LAST = {
 }
 
 
+def decodeEntities(text):
+    return entityRe.sub(lambda m: ENTITIES[m.group(1)], text) if "&" in text else text
+
+
+def tokenizeGeneric(line):
+    """Split a stripped HOCR line into its parts, by a regular expression per part.
+
+    See `tokenize()`.
+    """
+    match = endElemRe.match(line)
+    if match:
+        return (match.group(1), None, None, None, None)
+
+    match = elemRe.match(line)
+    elem = match.group(1) if match else None
+    match = clsRe.search(line) if elem else None
+    cls = match.group(1) if match else None
+    match = contentRe.search(line)
+    content = decodeEntities(match.group(1)) if match else None
+    match = titleRe.search(line)
+    title = match.group(1) if match else None
+    return (None, elem, cls, content, title)
+
+
+def tokenize(line):
+    """Split a stripped HOCR line into its parts.
+
+    Lines of character spans and other lines in the regular form are done
+    in one pass, other lines by `tokenizeGeneric()`, with the same result.
+
+    Returns
+    -------
+    tuple
+        `(endElem, elem, cls, content, title)`, where `endElem` is the element of
+        an end tag, and the others are the element of a start tag, its class,
+        the decoded text content and the title attribute.
+        Missing parts are None.
+    """
+    match = cinfoRe.match(line)
+    if match:
+        (box, conf, content) = match.groups()
+        return (
+            None,
+            "span",
+            "ocrx_cinfo",
+            decodeEntities(content),
+            f"x_bboxes {box}; x_conf {conf}",
+        )
+
+    if line.startswith("</"):
+        return tokenizeGeneric(line)
+
+    match = lineRe.match(line)
+    if not match:
+        return tokenizeGeneric(line)
+
+    (elem, attrText, content) = match.groups()
+    attrs = {}
+    for (name, value) in attrRe.findall(attrText):
+        attrs.setdefault(name, value)
+    return (
+        None,
+        elem,
+        attrs.get("class", None),
+        None if content is None else decodeEntities(content),
+        attrs.get("title", None),
+    )
+
+
+def tsvLines(lines, nest, unmatchedLines, first=0, fast=True):
+    """Simplify HOCR lines into lines of the intermediate TSV.
+
+    This is a generator that yields the TSV lines.
+    The containers that are open are kept on `nest`
+    and lines that are not recognized go to `unmatchedLines`, a `Diagnostics`
+    collection, by kind of error.
+
+    Lines with a character span are recognized by a single regular expression,
+    other lines are split by `tokenize()`.
+    With `fast=False` all lines are split by `tokenizeGeneric()` instead,
+    which gives the same result, more slowly.
+
+    Returns the number of the last line seen, and, if an end tag is met while
+    the stack is empty, that line; processing stops there.
+    """
+    i = first - 1
+    elem = None
+    tokenizer = tokenize if fast else tokenizeGeneric
+
+    for (i, line) in enumerate(lines, start=first):
+        line = line.strip()
+        if line == "":
+            continue
+
+        match = cinfoRe.match(line) if fast else None
+        if match:
+            elem = "span"
+            (box, conf, content) = match.groups()
+            if "&" in content:
+                content = decodeEntities(content)
+            yield f"{content}\tbox={box}\tconf={conf}\n"
+            continue
+
+        error = ""
+        kinds = []
+        (endElem, startElem, cls, content, title) = tokenizer(line)
+
+        if endElem is not None:
+            elem = endElem
+            if elem in IGNORE_ELEM:
+                continue
+            if len(nest) == 0:
+                return (i, line)
+            container = nest.pop()
+            yield f"∪{container}\n"
+            continue
+
+        outFields = []
+        afterLine = ""
+        if startElem is not None:
+            elem = startElem
+            if elem[0] in {"?", "!"} or elem in IGNORE_ELEM:
+                continue
+            container = None
+            if cls is not None:
+                container = clsDef[cls]
+            else:
+                if elem in CLSLESS_ELEM:
+                    container = elem
+            if container is None:
+                error += f" no elem class in {elem}"
+                kinds.append("no elem class")
+            else:
+                if container != CHAR:
+                    outFields.append(f"∩{container}")
+                    nest.append(container)
+                if line.endswith("/>"):
+                    afterLine = f"∪{container}\n"
+                    nest.pop()
+        else:
+            error += " no elem"
+            kinds.append("no elem")
+
+        if content is not None:
+            outFields.append(content)
+
+        if title is not None:
+            comps = title.split(";")
+            for comp in comps:
+                comp = comp.strip()
+                (key, value) = comp.split(" ", 1)
+                key = key.removeprefix("x_")
+                if key.startswith("bbox"):
+                    key = "box"
+                outFields.append(f"{key}={value}")
+        else:
+            if elem not in CLSLESS_ELEM:
+                error += " no title "
+                kinds.append("no title")
+
+        if error:
+            unmatchedLines.add(", ".join(kinds), (i, error, line))
+            continue
+
+        outLine = "\t".join(outFields)
+        yield f"{outLine}\n"
+        if afterLine:
+            yield afterLine
+            afterLine = ""
+
+    return (i, None)
+
+
+def simplifyLines(lines, nest, unmatchedLines, write, first=0):
+    """Simplify HOCR lines and pass the TSV lines to `write`.
+
+    See `tsvLines()`.
+    """
+    simpleLines = tsvLines(lines, nest, unmatchedLines, first)
+
+    while True:
+        try:
+            write(next(simpleLines))
+        except StopIteration as e:
+            return e.value
+
+
+def indexPages(source):
+    """Find the byte ranges and first line numbers of the pages of a HOCR file.
+
+    Returns a list of tuples `(page, start, end, line)`, where pages are numbered
+    from 1 onwards.
+    """
+    entries = []
+
+    with open(source, "rb") as fh, mmap.mmap(
+        fh.fileno(), 0, access=mmap.ACCESS_READ
+    ) as mm:
+        size = len(mm)
+        pos = mm.find(PAGE_MARK)
+        prevStart = 0
+        line = 0
+
+        while pos >= 0:
+            start = mm.rfind(b"\n", 0, pos) + 1
+            line += mm[prevStart:start].count(b"\n")
+            entries.append([len(entries) + 1, start, None, line])
+            prevStart = start
+            pos = mm.find(PAGE_MARK, mm.find(b"\n", pos) + 1 or size)
+
+    for (k, entry) in enumerate(entries):
+        entry[2] = entries[k + 1][1] if k + 1 < len(entries) else size
+
+    return [tuple(entry) for entry in entries]
+
+
+def simplifyChunk(source, start, end, first, spill=None):
+    """Simplify the HOCR lines between two byte offsets of the source.
+
+    This is the unit of work when simplifying page ranges or running in parallel.
+    The unmatched lines are collected separately per chunk, and may be spilled to
+    a file of their own.
+    """
+    with open(source, "rb") as fh, mmap.mmap(
+        fh.fileno(), 0, access=mmap.ACCESS_READ
+    ) as mm:
+        data = mm[start:end]
+
+    out = []
+    nest = []
+    unmatchedLines = Diagnostics("unmatched lines", spill=spill)
+    (i, stop) = simplifyLines(
+        io.TextIOWrapper(io.BytesIO(data)), nest, unmatchedLines, out.append, first
+    )
+    unmatchedLines.close()
+    return ("".join(out), unmatchedLines, nest, i, stop)
+
+
+def readState(pages):
+    """Initial counters for reading character records, see `readRecords()`."""
+    return dict(
+        cur={
+            PAGE: 0 if pages is None else pages[0] - 1,
+            PHOTO: 0,
+            TABLE: 0,
+            TR: 0,
+            TD: 0,
+            AREA: 0,
+            PARA: 0,
+            LINE: 0,
+            WORD: 0,
+            CHAR: 0,
+        },
+        amount={
+            PAGE: 0,
+            AREA: 0,
+            PARA: 0,
+            LINE: 0,
+            WORD: 0,
+            CHAR: 0,
+        },
+        other={
+            PHOTO: 0,
+            TABLE: 0,
+            TR: 0,
+            TD: 0,
+        },
+        spaceWidths=Diagnostics("spaces", size=0),
+        thinSpaces=0,
+    )
+
+
+def readRecords(lines, chars, boundaryFixes, state, thinSpaceThreshold):
+    """Turn lines of the intermediate TSV into character records.
+
+    The records are appended to `chars`, and the positions in `chars` before
+    which a word boundary is dropped because of a thin space go to
+    `boundaryFixes`. The counters in `state` are updated, see `readState()`.
+
+    This is a generator: it pauses right after the first record of every new page
+    has been appended, so that the records of the previous page can be
+    processed.
+    """
+    cur = state["cur"]
+    amount = state["amount"]
+    other = state["other"]
+    spaceWidths = state["spaceWidths"]
+
+    thinSpace = False
+    prevPage = None
+
+    for (i, line) in enumerate(lines):
+        fields = line.strip("\n").split("\t")
+        content = fields[0]
+        if line.startswith("∪"):
+            container = content[1:]
+            if container == PAGE:
+                amount[PAGE] += 1
+                cur[AREA] = 0
+                cur[PARA] = 0
+                cur[LINE] = 0
+                cur[WORD] = 0
+                cur[CHAR] = 0
+            elif container in {AREA, TD}:
+                if container == TD:
+                    other[container] += 1
+                amount[AREA] += 1
+                cur[PARA] = 0
+                cur[WORD] = 0
+                cur[CHAR] = 0
+            elif container == PARA:
+                amount[PARA] += 1
+                cur[WORD] = 0
+                cur[CHAR] = 0
+            elif container == LINE:
+                amount[LINE] += 1
+                cur[WORD] = 0
+                cur[CHAR] = 0
+            elif container == WORD:
+                if not thinSpace:
+                    amount[WORD] += 1
+                    cur[CHAR] = 0
+            else:
+                other[container] += 1
+        elif line.startswith("∩"):
+            container = content[1:]
+            if container == WORD and thinSpace:
+                thinSpace = False
+                boundaryFixes.add(len(chars))
+            else:
+                cur[container] += 1
+
+        else:
+            amount[CHAR] += 1
+            box = [int(x) for x in fields[1].split("=")[1].split()]
+            left = box[0]
+            right = box[2]
+            confidence = float(fields[2].split("=")[1])
+            width = right - left
+            if content == " ":
+                thinSpace = width <= thinSpaceThreshold
+                spaceWidths.add(min((int(round(width / 10)) * 10, 200)))
+            else:
+                thinSpace = False
+            if thinSpace:
+                cur[CHAR] -= 1
+                state["thinSpaces"] += 1
+            else:
+                page = cur[PAGE]
+                chars.append(
+                    i + 1,
+                    page,
+                    cur[AREA],
+                    cur[PARA],
+                    cur[LINE],
+                    cur[WORD],
+                    cur[CHAR],
+                    content,
+                    confidence,
+                    box,
+                )
+                if page != prevPage:
+                    if prevPage is not None:
+                        yield
+                    prevPage = page
+
+
+def chunkWords(chars, boundaryFixes, start, end, rawWords, wordJoins, first=0):
+    """Group character records into word records.
+
+    A new word starts where the word number or the section (page, area, para, line)
+    changes. These positions are found by comparing the columns of `chars`
+    with themselves shifted by one.
+    Per word, the confidences are summed over a slice of the confidence column,
+    and the letters are a slice of the letter string of `chars`.
+    The box of a word is the smallest box around the boxes of its characters,
+    leaving out trailing white space.
+    All words are split into letters and trailing punctuation by a single
+    regular expression search.
+
+    Parameters
+    ----------
+    chars: Chars
+        The character records.
+    boundaryFixes: set
+        Positions of characters before which a word boundary has been dropped.
+    start, end: integer
+        The range of records to process. `end` must be the start of a word,
+        or the end of the records.
+        If there is a record at `end`, it determines whether the last word ends
+        a line.
+    rawWords: list
+        The new word records are appended to this list.
+    wordJoins: Diagnostics
+        The word joins are added to this collection.
+    first: integer, optional 0
+        The number of word records that precede those in `rawWords`;
+        word joins refer to word records by their number.
+    """
+    if start >= end:
+        return
+
+    n = len(chars)
+    chars.finish()
+    text = chars.letters
+    confidences = chars.confidence
+    scale = CONFIDENCE_SCALE
+    (lefts, tops, rights, bottoms) = (chars.left, chars.top, chars.right, chars.bottom)
+    words = chars.word
+
+    starts = set(
+        compress(range(start + 1, end), map(ne, words[start:end], words[start + 1 : end]))
+    )
+    for c in (chars.line, chars.para, chars.area, chars.page):
+        starts.update(c.changes(start, end))
+    starts = [start] + sorted(starts)
+    ends = starts[1:] + [end]
+
+    # the fields that are kept as runs, at the starts of the words
+
+    offsets = chars.offsets.at(starts) + [chars.offset(end)]
+    (iS, pages, areas, paras, lines) = (
+        c.at(starts) for c in (chars.i, chars.page, chars.area, chars.para, chars.line)
+    )
+    lineStarts = set(chars.line.changes(start, min(end + 1, n)))
+
+    allLetters = [text[a:b] for (a, b) in zip(offsets, offsets[1:])]
+    parts = wordsRe.findall("".join(f"{letters}\n" for letters in allLetters))
+
+    fixes = sorted(j for j in boundaryFixes if start < j <= end and j < n)
+    f = 0
+    nFixes = len(fixes)
+
+    for (k, (a, b, letters, (realLetters, punc))) in enumerate(
+        zip(starts, ends, allLetters, parts)
+    ):
+        avConfidence = sum(confidences[a:b]) / (len(letters) * scale)
+        if realLetters == "":
+            realLetters = letters.rstrip()
+            punc = letters[len(realLetters) :]
+        nonWhite = punc.rstrip()
+        punc = nonWhite + " " if len(nonWhite) < len(punc) else ""
+        if b in lineStarts and not punc.endswith(" "):
+            punc += " "
+        e = b
+        while e > a + 1 and chars.letter(e - 1).isspace():
+            e -= 1
+
+        rawWords.append(
+            (
+                iS[k],
+                pages[k],
+                areas[k],
+                paras[k],
+                lines[k],
+                words[a],
+                realLetters,
+                punc,
+                avConfidence,
+                (min(lefts[a:e]), min(tops[a:e]), max(rights[a:e]), max(bottoms[a:e])),
+            )
+        )
+
+        fix = None
+        while f < nFixes and fixes[f] <= b:
+            fix = fixes[f]
+            f += 1
+        if fix is not None:
+            cut = chars.offset(fix) - offsets[k]
+            wordJoins.add("join", (first + len(rawWords), letters[0:cut], letters[cut:]))
+
+
+def isFooter(letters):
+    """Whether a word looks like the start of the string Digitized by Google."""
+    return distance(letters, "Digitized") < 3 or ratio(letters, "Digitizedby") > 0.6
+
+
+def cleanWords(
+    rawWords, startPage, endPage, headLinePos, headWords, report, footer=FOOTER_DISTANCE
+):
+    """Weed out unwanted words from a sequence of word records.
+
+    Removed are: the words on pages outside the range `startPage` - `endPage`,
+    the words on the header lines, which are saved in `headWords`, and the
+    strings Digitized by Google at the bottom of each page,
+    which are found by their edit distance. This is counted in `report`;
+    pages where the string is not found go to the `Diagnostics` collection
+    `report["missed"]`.
+
+    The edit distance is computed for all of the last 5 words of a page
+    (`footer="distance"`, the default), or only for those words that are at the
+    position of the footer (`footer="position"`): in the bottom band of the page
+    and not larger than the average word on the page, see `FOOTER_BAND` and
+    `FOOTER_SIZE`.
+    With `footer="compare"` both are done, the first is used, and
+    the pages where they agree and disagree are counted in `report["compare"]`,
+    together with the time both methods take.
+
+    This is a generator that yields the remaining word records.
+    Because the Google strings are found when the next page starts, among the
+    5 words before, it lags 5 words behind its input.
+    """
+    skips = set()
+    pending = collections.deque()
+    curPage = None
+    (pageBottom, heights, nPage) = (0, 0, 0)
+
+    compare = footer == FOOTER_COMPARE
+    if compare:
+        report["compare"] = collections.Counter()
+    byPosition = footer == FOOTER_POSITION
+
+    def byDistance(candidates):
+        for (f, (k, w)) in enumerate(candidates):
+            if isFooter(w[6]):
+                return f
+        return None
+
+    def atPosition(candidates):
+        band = pageBottom - FOOTER_BAND * heights / nPage
+        size = FOOTER_SIZE * heights / nPage
+        for (f, (k, w)) in enumerate(candidates):
+            (left, top, right, bottom) = w[9]
+            if bottom >= band and bottom - top <= size and isFooter(w[6]):
+                return f
+        return None
+
+    def step(j, page):
+        if curPage is not None:
+            candidates = [(k, w) for (k, w) in pending if j - 5 <= k < j]
+            if compare:
+                stats = report["compare"]
+                start = time.perf_counter()
+                f = byDistance(candidates)
+                stats["distance seconds"] += time.perf_counter() - start
+                start = time.perf_counter()
+                fp = atPosition(candidates)
+                stats["position seconds"] += time.perf_counter() - start
+                if f == fp:
+                    outcome = "missed by both" if f is None else "found by both"
+                elif fp is None:
+                    outcome = "only found by distance"
+                elif f is None:
+                    outcome = "only found by position"
+                else:
+                    outcome = "found at other words"
+                stats[outcome] += 1
+            else:
+                f = atPosition(candidates) if byPosition else byDistance(candidates)
+
+            if f is None:
+                report["missed"].add(
+                    "missed", (j - 1, page - 1, [w[6] for (k, w) in candidates])
+                )
+            else:
+                for (k, w) in candidates[f:]:
+                    skip1(k)
+                report["entries"] += 1
+
+    def skip1(k):
+        if k not in skips:
+            skips.add(k)
+            report["skips"] += 1
+
+    j = None
+
+    for (j, w) in enumerate(rawWords):
+        while pending and pending[0][0] < j - 5:
+            (k, kw) = pending.popleft()
+            if k in skips:
+                skips.discard(k)
+            else:
+                yield kw
+        pending.append((j, w))
+
+        (i, page, area, para, line, word, letters, punc, confidence, box) = w
+        if page < startPage or endPage >= 0 and page > endPage:
+            skip1(j)
+        else:
+            pageHeadLinePos = headLinePos.get(page, headLinePos.get(0, 0))
+            if line <= pageHeadLinePos:
+                skip1(j)
+                headWords.append((page, f"{letters}{punc}"))
+            if page != curPage:
+                step(j, page)
+                curPage = page
+                (pageBottom, heights, nPage) = (0, 0, 0)
+            bottom = box[3]
+            if bottom > pageBottom:
+                pageBottom = bottom
+            heights += bottom - box[1]
+            nPage += 1
+
+    if j is not None:
+        step(j, page)
+
+    for (k, kw) in pending:
+        if k not in skips:
+            yield kw
+
+
+def wordRow(w):
+    """Format a word record as a line of the word TSV file."""
+    (i, page, area, para, line, word, letters, punc, confidence, box) = w
+    text = "\t".join(
+        (
+            str(i),
+            str(page),
+            str(area),
+            str(para),
+            str(line),
+            str(word),
+            letters,
+            punc,
+            f"{confidence:.1f}",
+        )
+    )
+    return f"{text}\n"
+
+
+def fileStamp(path):
+    info = os.stat(path)
+    return (info.st_size, info.st_mtime_ns)
+
+
+def rangeSuffix(pages):
+    return "" if pages is None else f"-{pages[0]}-{pages[1]}"
+
+
+def rangeFile(path, suffix):
+    """The name of a file for a page range: the range goes before the extension."""
+    (stem, ext) = os.path.splitext(path)
+    return f"{stem}{suffix}{ext}"
+
+
+def pageRange(pages):
+    if pages is None or type(pages) is tuple:
+        return pages
+    return (pages, pages)
+
+
 class Hocr:
-    def __init__(self, volume):
+    def __init__(
+        self,
+        volume,
+        cache=False,
+        metrics=None,
+        base=None,
+        spill=False,
+        footer=FOOTER_DISTANCE,
+    ):
+        """Conversion of the HOCR source of a volume.
+
+        Parameters
+        ----------
+        volume: integer
+            The volume to convert.
+        cache: boolean, optional False
+            If True, the results of the stages simplify, read, wordify and clean
+            are stored in a stage cache, and loaded from there when the inputs
+            of a stage have not changed since.
+        metrics: object, optional None
+            A `metrics.Metrics` object; if given, the time, memory and number of
+            items of each stage are measured.
+        base: string, optional None
+            Work in this directory instead of the clone of the repository,
+            see `config.Config`.
+        spill: boolean, optional False
+            Of the diagnostics (unmatched lines, word joins, missed
+            Digitized by Google strings), only counts and a sample are kept.
+            If True, all of them are written to files in `_local/diagnostics`
+            as well.
+        footer: string, optional "distance"
+            How the strings Digitized by Google are found: `distance`,
+            `position` or `compare`, see `cleanWords()`.
+        """
         self.volume = volume
+        self.base = base
+        self.spill = spill
+        self.footer = footer
+        self.useCache = cache
+        self.metrics = metrics
+        self.stageKeys = {}
+        self.cacheSuffix = ""
         self.good = self.config()
 
     def config(self):
         volume = self.volume
 
-        C = Config()
+        C = Config(base=self.base)
         if not C.checkVolume(volume):
             return False
 
         self.C = C
-        self.source = f"{C.local}/{C.volumeName(volume)}_chocr.html"
+        self.source = findSource(f"{C.local}/{C.volumeName(volume)}_chocr.html")
         self.simpleSource = f"{C.local}/{C.volumeName(volume)}_chocr.tsv"
+        self.pageIndexFile = f"{C.local}/{C.volumeName(volume)}_chocr.pages.tsv"
         self.dest = f"{C.local}/{C.volumeName(volume)}_words.tsv"
+        self.boxesDest = f"{C.local}/{C.volumeName(volume)}_words.boxes"
+        if getattr(self, "cache", None) is None:
+            self.cache = StageCache(f"{C.local}/cache/{C.volumeName(volume)}")
 
         HC = HeadConfig()
         self.HC = HC
 
         return True
 
-    def simplify(self):
+    def fromCache(self, stage, key):
+        """Load the cached results of a stage into this object.
+
+        A key of None means that the inputs of the stage cannot be determined,
+        in which case the cache is not used.
+
+        Returns
+        -------
+        dict or None
+            The cached results, or None if there are none for this key.
+        """
+        if not self.useCache or key is None:
+            return None
+
+        self.stageKeys[stage] = key
+        data = self.cache.load(stage, key)
+        if data is not None:
+            print(f"Using cached results of {stage}")
+            for (name, value) in data.items():
+                setattr(self, name, value)
+        return data
+
+    def toCache(self, stage, **data):
+        if self.useCache and self.stageKeys.get(stage, None) is not None:
+            self.cache.save(stage, self.stageKeys[stage], data)
+
+    def diagnostics(self, name, size=SAMPLE_SIZE):
+        """Make a collection for diagnostic entries, see `diagnostics.Diagnostics`."""
+        C = self.C
+        spill = (
+            f"{C.local}/diagnostics/{C.volumeName(self.volume)}"
+            f"-{name.replace(' ', '-')}.tsv"
+            if self.spill
+            else None
+        )
+        return Diagnostics(name, size=size, spill=spill)
+
+    def cacheReport(self):
+        """Show which stages have been loaded from the cache and which not."""
+        self.cache.report()
+
+    def invalidate(self, stage=None):
+        """Remove the cached results of a stage, or of all stages.
+
+        Parameters
+        ----------
+        stage: string, optional None
+            One of `simplify`, `read`, `wordify`, `clean`, with a suffix
+            `-first-last` for page ranges.
+        """
+        if not self.config():
+            return
+        self.cache.invalidate(stage)
+
+    @metered("simplify", items=lambda self: self.simplifyResult[0] + 1)
+    def simplify(self, parallel=False, pages=None):
+        """Reduce the HOCR source to the intermediate TSV file.
+
+        Parameters
+        ----------
+        parallel: boolean or integer, optional False
+            If True or a positive integer, the pages are simplified in a pool
+            of that many processes (True: one per cpu) and the results
+            are stitched together in order.
+        pages: integer or tuple, optional None
+            If given, only this page or inclusive range of pages is simplified,
+            by means of the page index of the source.
+            The result goes to a separate TSV file, marked with the page range.
+        """
         if not self.config():
             return
 
@@ -91,101 +899,64 @@ class Hocr:
         if not os.path.exists(source):
             print(f"Source file does not exist: {unexpanduser(source)}")
 
-        simpleSource = self.simpleSource
         print("Simplifying HOCR source")
 
-        unmatchedLines = []
+        unmatchedLines = self.diagnostics("unmatched lines")
         nest = []
 
-        with open(source) as fh, open(simpleSource, "w") as dh:
-            for (i, line) in enumerate(fh):
-                error = ""
-                line = line.strip()
-                if line == "":
-                    continue
-
-                match = endElemRe.match(line)
-                if match:
-                    elem = match.group(1)
-                    if elem in IGNORE_ELEM:
-                        continue
-                    if len(nest) == 0:
-                        print(f"Line {i + 1}: empty stack:")
-                        print(f"{line}\n")
-                        break
-                    container = nest.pop()
-                    dh.write(f"∪{container}\n")
-                    continue
-
-                outFields = []
-                afterLine = ""
-                match = elemRe.match(line)
-                if match:
-                    elem = match.group(1)
-                    if elem[0] in {"?", "!"} or elem in IGNORE_ELEM:
-                        continue
-                    match = clsRe.search(line)
-                    container = None
-                    if match:
-                        cls = match.group(1)
-                        container = clsDef[cls]
-                    else:
-                        if elem in CLSLESS_ELEM:
-                            container = elem
-                    if container is None:
-                        error += f" no elem class in {elem}"
-                    else:
-                        if container != CHAR:
-                            outFields.append(f"∩{container}")
-                            nest.append(container)
-                        if line.endswith("/>"):
-                            afterLine = f"∪{container}\n"
-                            nest.pop()
-                else:
-                    error += " no elem"
-
-                match = contentRe.search(line)
-                if match:
-                    content = match.group(1)
-                    content = (
-                        content.replace("&lt;", "<")
-                        .replace("&gt;", ">")
-                        .replace("&apos;", "'")
-                        .replace("&quot;", '"')
-                        .replace("&amp;", "&")
-                    )
+        pages = pageRange(pages)
+        stage = f"simplify{rangeSuffix(pages)}"
+        simpleSource = self.simpleFile(pages)
 
-                    outFields.append(content)
-
-                match = titleRe.search(line)
-                if match:
-                    title = match.group(1)
-                    comps = title.split(";")
-                    for comp in comps:
-                        comp = comp.strip()
-                        (key, value) = comp.split(" ", 1)
-                        key = key.removeprefix("x_")
-                        if key.startswith("bbox"):
-                            key = "box"
-                        outFields.append(f"{key}={value}")
-                else:
-                    if elem not in CLSLESS_ELEM:
-                        error += " no title "
-
-                if error:
-                    unmatchedLines.append((i, error, line))
-                    continue
+        key = (
+            stageKey(self.cache.fileHash(source), pages)
+            if self.useCache and os.path.exists(source)
+            else None
+        )
+        data = self.fromCache(stage, key)
+        if (
+            data is not None
+            and os.path.exists(simpleSource)
+            and fileStamp(simpleSource) == data["simpleStamp"]
+        ):
+            self.simplifyReport(*self.simplifyResult)
+            return
+        if data is not None:
+            print(f"\tbut {unexpanduser(simpleSource)} has changed")
+            self.cache.log[stage] = "miss"
+
+        if compression(source) is not None and (parallel or pages is not None):
+            # the page index works with byte positions in the uncompressed file
+            if pages is not None:
+                print("Page ranges need an uncompressed source")
+                return
+            print("\tparallel mode needs an uncompressed source: running serially")
+            parallel = False
+
+        if parallel or pages is not None:
+            (i, stop) = self.simplifyChunks(nest, unmatchedLines, parallel, pages)
+        else:
+            with openText(source, prefetch=True) as fh, open(simpleSource, "w") as dh:
+                (i, stop) = simplifyLines(fh, nest, unmatchedLines, dh.write)
+
+        unmatchedLines.close()
+        self.simplifyResult = (i, stop, nest, unmatchedLines)
+        self.toCache(
+            stage,
+            simpleStamp=fileStamp(simpleSource),
+            simplifyResult=self.simplifyResult,
+        )
+        self.simplifyReport(i, stop, nest, unmatchedLines)
 
-                outLine = "\t".join(outFields)
-                dh.write(f"{outLine}\n")
-                if afterLine:
-                    dh.write(afterLine)
-                    afterLine = ""
+    def simplifyReport(self, i, stop, nest, unmatchedLines):
+        if stop is not None:
+            print(f"Line {i + 1}: empty stack:")
+            print(f"{stop}\n")
 
         if unmatchedLines:
-            print(f"{len(unmatchedLines)} unmatched lines")
-            for (i, error, line) in unmatchedLines[0:100]:
-                print(f"line {i:>7}: ({error.strip()}) {line}")
+            unmatchedLines.report(
+                fmt=lambda kind, e: f"line {e[0]:>7}: ({e[1].strip()}) {e[2]}"
+            )
         else:
             print("All lines recognized")
         if len(nest):
@@ -194,140 +965,172 @@ class Hocr:
         else:
             print("OK")
 
-    def read(self):
+    def pageIndex(self):
+        """Get the byte ranges of the pages in the HOCR source.
+
+        The index is kept in a sidecar file next to the source and is
+        rebuilt whenever the size or modification time of the source changes.
+
+        Returns
+        -------
+        list
+            Tuples `(page, start, end, line)`, see `indexPages()`.
+        """
+        source = self.source
+        pageIndexFile = self.pageIndexFile
+        stamp = "\t".join(str(x) for x in fileStamp(source))
+
+        if os.path.exists(pageIndexFile):
+            with open(pageIndexFile) as fh:
+                if next(fh, "").rstrip("\n") == stamp:
+                    return [tuple(int(x) for x in line.split("\t")) for line in fh]
+
+        print(f"Indexing pages of {unexpanduser(source)}")
+        entries = indexPages(source)
+
+        with open(pageIndexFile, "w") as fh:
+            fh.write(f"{stamp}\n")
+            for entry in entries:
+                fh.write("\t".join(str(x) for x in entry) + "\n")
+
+        return entries
+
+    def simpleFile(self, pages):
+        if pages is None:
+            return self.simpleSource
+        (first, last) = pages
+        return self.simpleSource.removesuffix(".tsv") + f"-{first}-{last}.tsv"
+
+    def simplifyChunks(self, nest, unmatchedLines, parallel, pages):
+        source = self.source
+        simpleSource = self.simpleFile(pages)
+        entries = self.pageIndex()
+
+        if pages is None:
+            chunks = [(0, entries[0][1] if entries else os.path.getsize(source), 0)]
+        else:
+            (first, last) = pages
+            entries = [e for e in entries if first <= e[0] <= last]
+            if not entries:
+                print(f"No pages in range {first}-{last}")
+                return (-1, None)
+            chunks = []
+        chunks.extend((start, end, line) for (page, start, end, line) in entries)
+
+        if parallel:
+            nProcs = os.cpu_count() if parallel is True else parallel
+
+            # group consecutive pages into a few chunks per process;
+            # material before the first page goes with the first chunk
+
+            nChunks = max(1, min(len(chunks), nProcs * 4))
+            chunkSize = -(-len(chunks) // nChunks)
+            chunks = [
+                (chunks[k][0], chunks[min(k + chunkSize, len(chunks)) - 1][1], chunks[k][2])
+                for k in range(0, len(chunks), chunkSize)
+            ]
+            print(f"\tin {len(chunks)} chunks of pages by {nProcs} processes")
+        else:
+            chunks = [(chunks[0][0], chunks[-1][1], chunks[0][2])]
+
+        results = []
+        spill = unmatchedLines.spill
+        spills = [None if spill is None else f"{spill}.{k}" for k in range(len(chunks))]
+
+        with (
+            ProcessPoolExecutor(max_workers=nProcs) if parallel else nullcontext()
+        ) as executor, open(simpleSource, "w") as dh:
+            for (k, result) in enumerate(
+                (executor.map if parallel else map)(
+                    simplifyChunk,
+                    [source] * len(chunks),
+                    *zip(*chunks),
+                    spills,
+                )
+            ):
+                (text, chunkUnmatched, chunkNest, i, stop) = result
+                if parallel and (stop is not None or k < len(chunks) - 1 and chunkNest):
+                    break
+                dh.write(text)
+                results.append(result)
+
+        if len(results) < len(chunks):
+            print("\tpage chunks are not balanced: falling back to serial mode")
+            for chunkSpill in spills:
+                if chunkSpill is not None and os.path.exists(chunkSpill):
+                    os.remove(chunkSpill)
+            if pages is not None:
+                return self.simplifyChunks(nest, unmatchedLines, False, pages)
+            with open(source) as fh, open(simpleSource, "w") as dh:
+                return simplifyLines(fh, nest, unmatchedLines, dh.write)
+
+        for (text, chunkUnmatched, chunkNest, i, stop) in results:
+            unmatchedLines.merge(chunkUnmatched)
+        nest.extend(chunkNest)
+        return (i, stop)
+
+    @metered("read", items=lambda self: len(self.simplified))
+    def read(self, pages=None, packed=False):
+        """Read the intermediate TSV file into character records.
+
+        Parameters
+        ----------
+        pages: integer or tuple, optional None
+            If given, read the TSV file of this page (range), as produced
+            by `simplify()` with the same `pages` argument.
+        packed: boolean, optional False
+            If True, use the packed, columnar version of the character records
+            if it is up to date, and otherwise make it after reading the TSV file.
+            Once packed, the TSV file itself is no longer needed.
+        """
         if not self.config():
             return
 
-        simpleSource = self.simpleSource
-
-        if not os.path.exists(simpleSource):
-            print(
-                "Simplified source file does not exist: "
-                f"{unexpanduser(simpleSource)}"
-            )
+        pages = pageRange(pages)
+        simpleSource = self.simpleFile(pages)
+        packFile = f"{simpleSource.removesuffix('.tsv')}.pack"
 
         self.config()
         C = self.C
 
-        cur = {
-            PAGE: 0,
-            PHOTO: 0,
-            TABLE: 0,
-            TR: 0,
-            TD: 0,
-            AREA: 0,
-            PARA: 0,
-            LINE: 0,
-            WORD: 0,
-            CHAR: 0,
-        }
-        amount = {
-            PAGE: 0,
-            AREA: 0,
-            PARA: 0,
-            LINE: 0,
-            WORD: 0,
-            CHAR: 0,
-        }
-        other = {
-            PHOTO: 0,
-            TABLE: 0,
-            TR: 0,
-            TD: 0,
-        }
-        self.amount = amount
-        boundaryFixes = set()
-        self.boundaryFixes = boundaryFixes
-        simplified = []
-        self.simplified = simplified
+        self.cacheSuffix = rangeSuffix(pages)
+        stage = f"read{self.cacheSuffix}"
+        key = (
+            stageKey(self.cache.fileHash(simpleSource), pages, C.thinSpaceThreshold)
+            if self.useCache and os.path.exists(simpleSource)
+            else None
+        )
 
-        spaceWidths = collections.Counter()
+        if self.fromCache(stage, key) is None:
+            if packed and self.unpack(packFile, simpleSource):
+                print(f"Read packed character records from {unexpanduser(packFile)}")
+            else:
+                self.readTsv(simpleSource, pages)
+                if packed:
+                    self.pack(packFile, simpleSource)
+
+            self.toCache(
+                stage,
+                simplified=self.simplified,
+                boundaryFixes=self.boundaryFixes,
+                amount=self.amount,
+                readStats=self.readStats,
+            )
 
-        print("Reading HOCR simplified source")
+        self.readReport(len(self.simplified), len(self.boundaryFixes))
 
-        with open(simpleSource) as fh:
-            thinSpace = False
-            thinSpaces = 0
-            thinSpaceThreshold = C.thinSpaceThreshold
-            j = 0
-
-            for (i, line) in enumerate(fh):
-                fields = line.strip("\n").split("\t")
-                content = fields[0]
-                if line.startswith("∪"):
-                    container = content[1:]
-                    if container == PAGE:
-                        amount[PAGE] += 1
-                        cur[AREA] = 0
-                        cur[PARA] = 0
-                        cur[LINE] = 0
-                        cur[WORD] = 0
-                        cur[CHAR] = 0
-                    elif container in {AREA, TD}:
-                        if container == TD:
-                            other[container] += 1
-                        amount[AREA] += 1
-                        cur[PARA] = 0
-                        cur[WORD] = 0
-                        cur[CHAR] = 0
-                    elif container == PARA:
-                        amount[PARA] += 1
-                        cur[WORD] = 0
-                        cur[CHAR] = 0
-                    elif container == LINE:
-                        amount[LINE] += 1
-                        cur[WORD] = 0
-                        cur[CHAR] = 0
-                    elif container == WORD:
-                        if not thinSpace:
-                            amount[WORD] += 1
-                            cur[CHAR] = 0
-                    else:
-                        other[container] += 1
-                elif line.startswith("∩"):
-                    container = content[1:]
-                    if container == WORD and thinSpace:
-                        thinSpace = False
-                        boundaryFixes.add(j)
-                    else:
-                        cur[container] += 1
+    def readReport(self, nChars, nFixes):
+        C = self.C
+        amount = self.amount
+        (other, spaceWidths, thinSpaces) = (
+            self.readStats[x] for x in ("other", "spaceWidths", "thinSpaces")
+        )
+        thinSpaceThreshold = C.thinSpaceThreshold
 
-                else:
-                    amount[CHAR] += 1
-                    box = fields[1].split("=")[1].split()
-                    left = int(box[0])
-                    right = int(box[2])
-                    confidence = float(fields[2].split("=")[1])
-                    width = right - left
-                    if content == " ":
-                        thinSpace = width <= thinSpaceThreshold
-                        spaceWidths[min((int(round(width / 10)) * 10, 200))] += 1
-                    else:
-                        thinSpace = False
-                    if thinSpace:
-                        cur[CHAR] -= 1
-                        thinSpaces += 1
-                    else:
-                        simplified.append(
-                            (
-                                i + 1,
-                                cur[PAGE],
-                                cur[AREA],
-                                cur[PARA],
-                                cur[LINE],
-                                cur[WORD],
-                                cur[CHAR],
-                                content,
-                                confidence,
-                                width,
-                            )
-                        )
-                        j += 1
-
-        for (w, n) in sorted(spaceWidths.items()):
+        for (w, n) in sorted(spaceWidths.counts.items()):
             print(f"{n:>7} spaces with width {w:>2}")
         print(
-            f"Inhibited {len(boundaryFixes)} word boundaries after a thin space"
+            f"Inhibited {nFixes} word boundaries after a thin space"
             f" of <= {thinSpaceThreshold} px"
         )
 
@@ -347,12 +1150,94 @@ class Hocr:
                 print(f"{kind:<10}: {n:>7} x minus {thinSpaces} = {n - thinSpaces}")
                 print(
                     f"Is this equal to the resulting number of charachter records?"
-                    f" {n - thinSpaces == len(simplified)}"
+                    f" {n - thinSpaces == nChars}"
                 )
             else:
                 print(f"{kind:<10}: {n:>7} x")
         print("OK")
 
+    def readTsv(self, simpleSource, pages):
+        if not os.path.exists(simpleSource):
+            print(
+                "Simplified source file does not exist: "
+                f"{unexpanduser(simpleSource)}"
+            )
+
+        C = self.C
+
+        state = readState(pages)
+        self.amount = state["amount"]
+        boundaryFixes = set()
+        self.boundaryFixes = boundaryFixes
+        simplified = Chars()
+        self.simplified = simplified
+
+        print("Reading HOCR simplified source")
+
+        with open(simpleSource) as fh:
+            for _ in readRecords(
+                fh, simplified, boundaryFixes, state, C.thinSpaceThreshold
+            ):
+                pass
+
+        simplified.finish()
+
+        self.readStats = {
+            k: state[k] for k in ("other", "spaceWidths", "thinSpaces")
+        }
+
+    def pack(self, packFile, simpleSource):
+        """Save the character records in their columnar form.
+
+        The records are already kept as typed arrays, see `chars.Chars`,
+        so they can be saved and loaded as they are.
+        """
+        data = dict(
+            version=PACK_VERSION,
+            stamp=fileStamp(simpleSource),
+            thinSpaceThreshold=self.C.thinSpaceThreshold,
+            simplified=self.simplified,
+            boundaryFixes=array("I", sorted(self.boundaryFixes)),
+            amount=self.amount,
+            readStats=self.readStats,
+        )
+
+        with gzip.open(packFile, "wb", compresslevel=PACK_COMPRESS) as fh:
+            pickle.dump(data, fh, protocol=pickle.HIGHEST_PROTOCOL)
+        print(f"Packed character records into {unexpanduser(packFile)}")
+
+    def unpack(self, packFile, simpleSource):
+        """Load the packed character records, if they are up to date.
+
+        They are up to date if they have been made with the current thin space
+        threshold from the TSV file as it is now, or if that file is gone.
+
+        Returns
+        -------
+        boolean
+            Whether the packed records could be used.
+        """
+        if not os.path.exists(packFile):
+            return False
+
+        with gzip.open(packFile, "rb") as fh:
+            data = pickle.load(fh)
+
+        if (
+            data["version"] != PACK_VERSION
+            or data["thinSpaceThreshold"] != self.C.thinSpaceThreshold
+            or os.path.exists(simpleSource)
+            and data["stamp"] != fileStamp(simpleSource)
+        ):
+            return False
+
+        self.simplified = data["simplified"]
+        self.boundaryFixes = set(data["boundaryFixes"])
+        self.amount = data["amount"]
+        self.readStats = data["readStats"]
+        return True
+
+    @metered("wordify", items=lambda self: len(self.rawWords))
     def wordify(self):
         if not self.config():
             return
@@ -360,89 +1245,99 @@ class Hocr:
         simplified = self.simplified
         boundaryFixes = self.boundaryFixes
 
-        print("Chunking characters into words")
-
-        curLine = None
-        curWord = None
-        curSection = None
-        letters = ""
-        sumConfidence = 0
+        suffix = self.cacheSuffix
+        stage = f"wordify{suffix}"
+        if self.fromCache(stage, self.upstreamKey(f"read{suffix}")) is not None:
+            self.wordifyReport(len(self.rawWords), self.wordJoins)
+            return
 
-        before = None
+        print("Chunking characters into words")
 
         rawWords = []
         self.rawWords = rawWords
-        wordJoins = []
+        wordJoins = self.diagnostics("word joins")
         self.wordJoins = wordJoins
 
-        def step():
-            if curWord is not None:
-                avConfidence = sumConfidence / len(letters)
-                (realLetters, punc) = wordRe.findall(letters)[0]
-                if realLetters == "":
-                    (realLetters, punc) = word2Re.findall(letters)[0]
-                (nonWhite, white) = whiteRe.findall(punc)[0]
-                punc = nonWhite + " " if white else ""
-                if curLine != line and not punc.endswith(" "):
-                    punc += " "
-
-                rawWords.append(
-                    (firstI, *curSection, curWord, realLetters, punc, avConfidence)
-                )
-                if before is not None:
-                    wordJoins.append(
-                        (len(rawWords), before, letters.removeprefix(before))
-                    )
+        chunkWords(simplified, boundaryFixes, 0, len(simplified), rawWords, wordJoins)
+
+        wordJoins.close()
+        self.toCache(stage, rawWords=rawWords, wordJoins=wordJoins)
+        self.wordifyReport(len(rawWords), wordJoins)
+
+    def wordifyReport(self, nRawWords, wordJoins):
+        print(f"{nRawWords} raw words")
 
-        for (
-            j,
-            (i, page, area, para, line, word, char, letter, confidence, width),
-        ) in enumerate(simplified):
-            if curLine is None:
-                curLine = line
-            if j in boundaryFixes:
-                before = letters
-            section = (page, area, para, line)
-            newSection = curSection != section
-            newWord = curWord != word
-            if newWord or newSection:
-                step()
-                if before is not None:
-                    before = None
-                if newWord:
-                    curWord = word
-                if newSection:
-                    curSection = section
-                letters = ""
-                sumConfidence = 0
-                firstI = i
-
-            letters += letter
-            sumConfidence += float(confidence)
-            curLine = line
-
-        step()
-
-        print(f"{len(rawWords)} raw words")
-
-        print(f"{len(wordJoins)} word joins:")
-        for (k, before, punc) in wordJoins[0:100]:
-            print(f"line {k:>7}: {before} + {punc}")
+        wordJoins.report(fmt=lambda kind, e: f"line {e[0]:>7}: {e[1]} + {e[2]}")
 
+    @metered("clean", items=lambda self: len(self.words))
     def clean(self):
         if not self.config():
             return
 
+        rawWords = self.rawWords
+
+        suffix = self.cacheSuffix
+        stage = f"clean{suffix}"
+        key = self.upstreamKey(f"wordify{suffix}", *self.cleanInputs())
+        if self.fromCache(stage, key) is not None:
+            self.cleanStats(*self.cleanCounts)
+            return
+
+        headWords = []
+        report = dict(
+            entries=0, missed=self.diagnostics("missed Digitized by Google"), skips=0
+        )
+        words = list(
+            cleanWords(rawWords, *self.cleanSpecs(), headWords, report, self.footer)
+        )
+        report["missed"].close()
+        self.words = words
+
+        self.cleanReport(headWords, report, len(words))
+        self.toCache(
+            stage,
+            words=words,
+            headLines=self.headLines,
+            headData=self.headData,
+            cleanCounts=self.cleanCounts,
+        )
+
+    def upstreamKey(self, upstream, *inputs):
+        """The key of a stage whose inputs are the results of an earlier stage."""
+        key = self.stageKeys.get(upstream, None)
+        return None if key is None else stageKey(upstream, key, *inputs)
+
+    def cleanInputs(self):
+        """The configuration values that clean and the head analysis depend on."""
+        volume = self.volume
+        C = self.C
+        HC = self.HC
+        info = C.volumeInfo[volume]
+        return (
+            info["startPage"],
+            info["endPage"],
+            self.footer,
+            HC.getData("lines", volume, {}),
+            tuple(
+                HC.getData(kind, volume, {})
+                for kind in (
+                    "corrections",
+                    "months",
+                    "monthHints",
+                    "days",
+                    "dayGaps",
+                    "isRight",
+                )
+            ),
+        )
+
+    def cleanSpecs(self):
         volume = self.volume
         C = self.C
         HC = self.HC
-        rawWords = self.rawWords
-        amount = self.amount
         startPage = C.volumeInfo[volume]["startPage"]
         endPage = C.volumeInfo[volume]["endPage"]
-        headLinePos = HC.lines[volume]
-
-        skips = set()
+        headLinePos = HC.getData("lines", volume, {})
 
         print(
             dedent(
@@ -456,60 +1351,9 @@ class Hocr:
             """.strip()
             )
         )
+        return (startPage, endPage, headLinePos)
 
-        curPage = None
-        entries = 0
-        missed = 0
-        headWords = []
-
-        def step():
-            nonlocal entries
-            nonlocal missed
-
-            if curPage is not None:
-                skip = False
-                prevs = []
-                for k in range(j - 5, j):
-                    if skip:
-                        skips.add(k)
-                    else:
-                        letters = rawWords[k][6]
-                        prevs.append(letters)
-                        if (
-                            distance(letters, "Digitized") < 3
-                            or ratio(letters, "Digitizedby") > 0.6
-                        ):
-                            skips.add(k)
-                            skip = True
-                if skip:
-                    entries += 1
-                else:
-                    print(f"Line {j - 1:>6} page {page - 1:>3}: {prevs}")
-                    missed += 1
-
-        for (
-            j,
-            (i, page, area, para, line, word, letters, punc, confidence),
-        ) in enumerate(rawWords):
-            if page < startPage or endPage >= 0 and page > endPage:
-                skips.add(j)
-            else:
-                pageHeadLinePos = headLinePos.get(page, headLinePos.get(0, 0))
-                if line <= pageHeadLinePos:
-                    skips.add(j)
-                    headWords.append((page, f"{letters}{punc}"))
-                if page != curPage:
-                    step()
-                    curPage = page
-        step()
-
-        words = []
-        self.words = words
-
-        for (j, w) in enumerate(rawWords):
-            if j not in skips:
-                words.append(w)
-
+    def cleanReport(self, headWords, report, nWords):
         headLines = {}
         self.headLines = headLines
         for (page, word) in headWords:
@@ -518,16 +1362,128 @@ class Hocr:
             headLines[page] = " ".join(wrds)
         self.analyseHeads()
 
-        print(f"Missed 'Digitized by Google' {missed} x")
-        print(f"Deleted 'Digitized by Google' {entries} x")
-        print(f"Separated {len(headWords)} words in {len(headLines)} header lines")
-        print(f"{len(words)} words")
-        print(f"Not counting {len(skips)} skipped words")
+        self.cleanCounts = (report, len(headWords), len(headLines), nWords)
+        self.cleanStats(*self.cleanCounts)
+
+    def cleanStats(self, report, nHeadWords, nHeadLines, nWords):
+        amount = self.amount
+        skips = report["skips"]
+
+        report["missed"].report(
+            fmt=lambda kind, e: f"Line {e[0]:>6} page {e[1]:>3}: {e[2]}"
+        )
+        print(f"Deleted 'Digitized by Google' {report['entries']} x")
+        if "compare" in report:
+            self.footerReport(report["compare"])
+        print(f"Separated {nHeadWords} words in {nHeadLines} header lines")
+        print(f"{nWords} words")
+        print(f"Not counting {skips} skipped words")
         print(
             f"Did all other words make it into the word records?"
-            f" {amount[WORD] - len(skips) == len(words)}"
+            f" {amount[WORD] - skips == nWords}"
+        )
+
+    def footerReport(self, stats):
+        """Show how finding the footer by position compares with finding it by distance."""
+        secD = stats["distance seconds"]
+        secP = stats["position seconds"]
+        print("Finding 'Digitized by Google' by position versus by distance only:")
+        for (outcome, n) in sorted(stats.items()):
+            if not outcome.endswith("seconds"):
+                print(f"\t{n:>5} pages: {outcome}")
+        print(
+            f"\t{secD * 1000:.1f} ms by distance, {secP * 1000:.1f} ms by position:"
+            f" {secD / secP if secP else 0:.1f} x faster"
+        )
+
+    @metered("stream", items=lambda self: self.cleanCounts[3])
+    def stream(self):
+        """Convert the HOCR source to the word, word box and head line files in one pass.
+
+        The stages simplify, read, wordify, clean and write are chained as
+        generators: there is no intermediate TSV file, and the character and
+        word records are not kept for the whole volume, only for the current
+        page. So memory use does not grow with the size of the volume.
+
+        The resulting files are the same as when the stages are run one by one.
+        """
+        if not self.config():
+            return
+
+        C = self.C
+        source = self.source
+        dest = self.dest
+
+        if not os.path.exists(source):
+            print(f"Source file does not exist: {unexpanduser(source)}")
+
+        print(f"Streaming HOCR source to {unexpanduser(dest)}")
+
+        unmatchedLines = self.diagnostics("unmatched lines")
+        nest = []
+        ends = []
+        state = readState(None)
+        self.amount = state["amount"]
+        chars = Chars()
+        boundaryFixes = set()
+        joins = dict(fixes=0, chars=0, rawWords=0)
+        wordJoins = self.diagnostics("word joins")
+        headWords = []
+        report = dict(
+            entries=0, missed=self.diagnostics("missed Digitized by Google"), skips=0
         )
+        nWords = 0
+        pages = array("h")
+
+        def simpleLines(fh):
+            ends.append((yield from tsvLines(fh, nest, unmatchedLines)))
+
+        def wordsUntil(end):
+            joins["fixes"] += sum(1 for j in boundaryFixes if j <= end)
+            joins["chars"] += end
+            rawWords = []
+            chunkWords(
+                chars, boundaryFixes, 0, end, rawWords, wordJoins, joins["rawWords"]
+            )
+            joins["rawWords"] += len(rawWords)
 
+            chars.drop(end)
+            fixes = {j - end for j in boundaryFixes if j > end}
+            boundaryFixes.clear()
+            boundaryFixes.update(fixes)
+            return rawWords
+
+        def rawWords(fh):
+            for _ in readRecords(
+                simpleLines(fh), chars, boundaryFixes, state, C.thinSpaceThreshold
+            ):
+                yield from wordsUntil(len(chars) - 1)
+            yield from wordsUntil(len(chars))
+
+        with openText(source, prefetch=True) as fh, open(dest, "w") as dh, BoxWriter(
+            self.boxesDest
+        ) as bh:
+            for w in cleanWords(
+                rawWords(fh), *self.cleanSpecs(), headWords, report, self.footer
+            ):
+                dh.write(wordRow(w))
+                bh.add(w[1], w[9])
+                pages.append(w[1])
+                nWords += 1
+
+        for diagnostics in (unmatchedLines, wordJoins, report["missed"]):
+            diagnostics.close()
+
+        self.simplifyReport(*ends[0], nest, unmatchedLines)
+        self.readStats = {
+            k: state[k] for k in ("other", "spaceWidths", "thinSpaces")
+        }
+        self.readReport(joins["chars"], joins["fixes"])
+        self.wordifyReport(joins["rawWords"], wordJoins)
+        self.cleanReport(headWords, report, nWords)
+        self.writeHeads(pageRows(pages))
+
+    @metered("analyseHeads", items=lambda self: len(self.headData))
     def analyseHeads(self, start=None, end=None, show=False):
         HC = self.HC
         volume = self.volume
@@ -541,39 +1497,7 @@ class Hocr:
         isRightStart = HC.getData("isRight", volume, {})
 
         headLines = self.headLines
-
-        def matchMonth(word, show=False):
-            word = word.lower()
-            if word in monthHints:
-                return monthHints[word]
-
-            word = word.replace("ü", "u").replace("ë", "e").replace("é", "e")
-            rs = []
-            for (i, m) in enumerate(months):
-                r = ratio(m, word)
-                rs.append(r)
-
-            theI = None
-            maxR = max(rs)
-            maxI = [i for i in range(len(rs)) if rs[i] == maxR][0]
-            hiRep = ""
-            if maxR >= 0.54:
-                diff = 0.04 if maxR >= 0.7 else 0.09 if maxR >= 0.6 else 0.12
-                threshold = maxR - diff
-                highIs = [i for (i, r) in enumerate(rs) if r >= threshold]
-                if len(highIs) == 1:
-                    theI = maxI
-                    hiRep = f" single match >= {threshold:>.2f}"
-                else:
-                    hiRep = f" {len(highIs)} matches >= {threshold:.2f}"
-
-            if show:
-                print(f"{word} best match {maxR:.2f} {hiRep}")
-                for i in range(len(rs)):
-                    print(
-                        f"\t{'OK' if i == theI else 'XX'} ~{rs[i]:.2f} {months[i]:<12}"
-                    )
-            return None if theI is None else months[theI]
+        matcher = monthMatcher(months, monthHints)
 
         def separate(word, show=False):
             if show:
@@ -629,7 +1553,7 @@ class Hocr:
         def analyseHead(isRight, pageNum, curYear, show=False):
             side = "R" if isRight else "L"
             head = headLines[pageNum]
-            words = separate(head, show=show)
+            words = separate(head, show=show) if show else headWords[pageNum]
             monthStr = ""
             pageNumbers = []
             dotSeen = False
@@ -649,7 +1573,9 @@ class Hocr:
                     continue
 
                 if not monthStr and len(word) > 3:
-                    tryMonth = matchMonth(word, show=show)
+                    tryMonth = (
+                        matcher.match(word, show=True) if show else monthOf[word]
+                    )
                     if tryMonth:
                         monthStr = tryMonth
                         continue
@@ -721,16 +1647,27 @@ class Hocr:
         headData = []
         self.headData = headData
 
+        pageNums = sorted(headLines)
+        inRange = {
+            pageNum
+            for pageNum in pageNums
+            if (start is None or pageNum >= start) and (end is None or pageNum <= end)
+        }
+
+        # without show, the head lines are split, and their words matched with the
+        # months, all in one go
+
+        if not show:
+            headWords = {pageNum: separate(headLines[pageNum]) for pageNum in inRange}
+            monthOf = matcher.matchAll(
+                word for words in headWords.values() for word in words if len(word) > 3
+            )
+
         isRight = isRightStart
         curYear = ""
 
-        for pageNum in sorted(headLines):
-            if (
-                start is not None
-                and pageNum < start
-                or end is not None
-                and pageNum > end
-            ):
+        for pageNum in pageNums:
+            if pageNum not in inRange:
                 isRight = not isRight
                 continue
             head = analyseHead(isRight, pageNum, curYear, show=show)
@@ -827,39 +1764,47 @@ class Hocr:
         for (status, n) in sorted(report.items(), key=lambda x: (x[1], x[0])):
             print(f"\t{n:>4} pages: {status}")
 
+    @metered("write", items=lambda self: len(self.words))
     def write(self):
         if not self.config():
             return
 
+        words = self.words
+
+        # after reading a page range, the files of the whole volume stay as they are
+
+        suffix = self.cacheSuffix
+        dest = rangeFile(self.dest, suffix)
+        boxesDest = rangeFile(self.boxesDest, suffix)
+
+        print(f"Writing word file as tsv: {unexpanduser(dest)}")
+        print(f"Writing word boxes: {unexpanduser(boxesDest)}")
+
+        with open(dest, "w") as dh, BoxWriter(boxesDest) as bh:
+            for w in words:
+                dh.write(wordRow(w))
+                bh.add(w[1], w[9])
+
+        self.writeHeads(pageRows(w[1] for w in words), suffix=suffix)
+
+    def writeHeads(self, rows, suffix=""):
+        """Write the head line file and the date index.
+
+        Parameters
+        ----------
+        rows: dict
+            The ranges of the words per page in the word file, see `dates.pageRows()`.
+        suffix: string, optional ""
+            The page range of the files, if not the whole volume, see `rangeSuffix()`.
+        """
         C = self.C
         volume = self.volume
         auxDir = f"{C.auxDir}/{C.volumeNameNum(volume)}"
         if not os.path.exists(auxDir):
             os.makedirs(auxDir, exist_ok=True)
 
-        words = self.words
         headData = self.headData
-        dest = self.dest
-        aux = f"{auxDir}/heads.tsv"
-
-        print(f"Writing word file as tsv: {unexpanduser(dest)}")
-
-        with open(dest, "w") as dh:
-            for (i, page, area, para, line, word, letters, punc, confidence) in words:
-                text = "\t".join(
-                    (
-                        str(i),
-                        str(page),
-                        str(area),
-                        str(para),
-                        str(line),
-                        str(word),
-                        letters,
-                        punc,
-                        f"{confidence:.1f}",
-                    )
-                )
-                dh.write(f"{text}\n")
+        aux = rangeFile(f"{auxDir}/heads.tsv", suffix)
 
         print(f"Writing head line file as tsv: {unexpanduser(aux)}")
 
@@ -868,3 +1813,7 @@ class Hocr:
             for entry in headData:
                 text = "\t".join(str(f) for f in entry)
                 ah.write(f"{text}\n")
+
+        datesAux = rangeFile(f"{auxDir}/{DATES_FILE}", suffix)
+        nDated = writeDates(datesAux, headData, rows)
+        print(f"Writing date index of {nDated} pages: {unexpanduser(datesAux)}")
@@ -2,10 +2,11 @@ import collections
 import re
 
 from config import Config
+from compressed import findSource, openText
 
 
 C = Config()
-SOURCE = f"{C.local}/{C.name}_chocr.html"
+SOURCE = findSource(f"{C.local}/{C.name}_chocr.html")
 DEST = f"{C.local}/{C.name}_divs.txt"
 
 elemClassRe = re.compile(r'''^<(\S+) class="([^"]*)''')
@@ -13,7 +14,7 @@ elemClassRe = re.compile(r'''^<(\S+) class="([^"]*)''')
 elems = collections.Counter()
 
 
-with open(SOURCE) as fh, open(DEST, "w") as dh:
+with openText(SOURCE, prefetch=True) as fh, open(DEST, "w") as dh:
     for line in fh:
         line = line.strip()
         match = elemClassRe.match(line)
@@ -12,6 +12,7 @@ from tf.core.helpers import unexpanduser
 from tf.advanced.helpers import dm
 from config import Config
 from tfFromTsv import loadTf
+from wordindex import wordIndex
 
 
 CONSONANT_RE = re.compile(r"""[bcdfghjklmnpqrstvwxz]{2}""")
@@ -250,22 +251,16 @@ class PostOcr:
         """Load corpus into Text-Fabric."""
         volume = self.volume
         print("Loading TF data ...")
-        TF = loadTf(volume, silent=True)
+        TF = loadTf(volume, silent=True, features=["letters"])
         self.TF = TF
         print("done")
 
     def getWords(self):
-        TF = self.TF
-        F = TF.api.F
         postDir = self.postDir
 
-        WORD_OCCS = collections.defaultdict(list)
+        WORD_OCCS = wordIndex(self.volume)
         self.WORD_OCCS = WORD_OCCS
-
-        for w in F.otype.s("word"):
-            word = F.letters.v(w)
-            WORD_OCCS[word].append(w)
-        print(f"{len(WORD_OCCS)} words in {F.otype.maxSlot} occurrences")
+        print(f"{len(WORD_OCCS)} words in {WORD_OCCS.total} occurrences")
 
         filePath = f"{postDir}/wordfreqs.tsv"
         with open(filePath, "w") as fh:
@@ -1,5 +1,6 @@
 import os
-import collections
+
+from wordindex import wordIndex
 
 
 class WordSplit:
@@ -10,17 +11,9 @@ class WordSplit:
         self.getWords()
 
     def getWords(self):
-        TF = self.TF
-        F = TF.api.F
-        postDir = self.postDir
-
-        WORD_OCCS = collections.defaultdict(list)
+        WORD_OCCS = wordIndex(self.volume)
         self.WORD_OCCS = WORD_OCCS
-
-        for w in F.otype.s("word"):
-            word = F.letters.v(w)
-            WORD_OCCS[word].append(w)
-        print(f"{len(WORD_OCCS)} words in {F.otype.maxSlot} occurrences")
+        print(f"{len(WORD_OCCS)} words in {WORD_OCCS.total} occurrences")
 
     def getCompositions(self):
         """Compute all word compositions into two.
@@ -1,8 +1,11 @@
 from itertools import chain
 import re
 import collections
+from array import array
 from textwrap import dedent
 
+from wordindex import WordIndex
+
 
 CONSONANT_RE = re.compile(r"""[bcdfghjklmnpqrstvwxz]{2}""")
 
@@ -24,17 +27,13 @@ class Gram:
         self.words = list(chain.from_iterable((w for w in word.split("┼") if not w.startswith("⁼")) for word in words))
         words = self.words
 
-        wordOccs = collections.defaultdict(list)
+        wordOccs = WordIndex.fromWords(words)
         self.wordOccs = wordOccs
-
-        for (w, word) in enumerate(words):
-            wordOccs[word].append(w)
         print(f"{len(wordOccs)} words in {len(words)} occurrences")
 
         chars = collections.Counter()
 
-        for (word, occs) in wordOccs.items():
-            freq = len(occs)
+        for (word, freq) in wordOccs.freqs():
             for c in word:
                 chars[c] += freq
 
@@ -85,6 +84,10 @@ class Gram:
             keyed by `n` and valued with the *list* of n-grams in that word.
             So again, the multiplicity of grams in a word
             is taken into account.
+        *   `GRAM_ID[n]["gram"]` gives per n-gram a number, in the order
+            of `GRAM[n]`, and `GRAM_COUNT[n]` is an array with
+            the frequency in the corpus of every n-gram, by number;
+            see `occFreq()`.
 
         We surround each word by a space first,
         in order to be sensitive to word boundaries.
@@ -109,6 +112,10 @@ class Gram:
         GRAM_INDEX = collections.defaultdict(lambda: {n: [] for n in NS})
         self.GRAM_INDEX = GRAM_INDEX
 
+        GRAM_ID = {n: {} for n in NS}
+        self.GRAM_ID = GRAM_ID
+        gramFreqs = {n: [] for n in NS}
+
         LEGAL_COMBIS = {
             x: {2: collections.defaultdict(dict), 3: collections.defaultdict(dict)}
             for x in (False, True)
@@ -122,7 +129,7 @@ class Gram:
         ALLOWED_GRAMS = {n: set() for n in NS}
         self.ALLOWED_GRAMS = ALLOWED_GRAMS
 
-        for word in wordOccs:
+        for (word, freq) in wordOccs.freqs():
             end = len(word) - 1
             for (i, c) in enumerate(word):
                 for n in NS:
@@ -140,6 +147,15 @@ class Gram:
                         gram = prefix + word[start : i + 1] + suffix
                     GRAM[n][gram].append(word)
                     GRAM_INDEX[word][n].append(gram)
+                    ids = GRAM_ID[n]
+                    gramId = ids.setdefault(gram, len(ids))
+                    freqs = gramFreqs[n]
+                    if gramId == len(freqs):
+                        freqs.append(freq)
+                    else:
+                        freqs[gramId] += freq
+
+        self.GRAM_COUNT = {n: array("Q", freqs) for (n, freqs) in gramFreqs.items()}
 
         for (n, grams) in GRAM.items():
             print(f"{len(grams)} distinct {n}-grams")
@@ -147,11 +163,10 @@ class Gram:
     def occFreq(self, n, gram):
         """Get the frequency of an n-gram in the corpus.
 
-        All distinct words in which the n-gram occurs are looked up,
-        and their frequencies are summed up.
+        This is the sum of the frequencies of the distinct words in which
+        the n-gram occurs, as computed by `getGrams()`.
 
-        If an n-gram occurs more than once in a word, that word
-        will be encountered that many times, so the frequency
+        If an n-gram occurs more than once in a word, the frequency
         of such a word is effectively multiplied by the number of times
         the gram occurs in that word.
 
@@ -165,13 +180,14 @@ class Gram:
         Returns
         -------
         int
-            The frequency of the n-gram in the corpus
+            The frequency of the n-gram in the corpus, 0 if it does not occur
         """
-        GRAM = self.GRAM
-        wordOccs = self.wordOccs
+        gramId = self.GRAM_ID[n].get(gram, None)
+        return 0 if gramId is None else self.GRAM_COUNT[n][gramId]
 
-        words = GRAM[n][gram]
-        return sum(len(wordOccs[word]) for word in words)
+    def gramFreqs(self, n):
+        """Iterate over the n-grams and their frequencies in the corpus."""
+        return zip(self.GRAM_ID[n], self.GRAM_COUNT[n])
 
     def getCombis(self, kind, n, deliver=False):
         """Get n-grams that start or end with consonant combinations.
@@ -194,7 +210,6 @@ class Gram:
             at the appropriate side of the word, and valued with
             the tuple of main part and other parts of the combination, lowercased.
         """
-        GRAM = self.GRAM
         ILLEGAL_GRAMS = self.ILLEGAL_GRAMS
         theseIllegalGrams = ILLEGAL_GRAMS[kind][2]
         combis = collections.defaultdict(collections.Counter)
@@ -211,7 +226,7 @@ class Gram:
         )
 
         if n == 2:
-            for gram in GRAM[n]:
+            for (gram, freq) in self.gramFreqs(n):
                 if not isTrueBi(gram):
                     continue
                 if gram[boundary] != boundaryChar:
@@ -219,13 +234,12 @@ class Gram:
                 bareGram = method(gram).lower()
                 if not CONSONANT_RE.match(bareGram):
                     continue
-                freq = self.occFreq(n, gram)
                 main = bareGram[boundary]
                 other = bareGram[otherBoundary]
                 combis[main][other] += freq
                 allCombis[gram] = (main, other)
         elif n == 3:
-            for gram in GRAM[n]:
+            for (gram, freq) in self.gramFreqs(n):
                 if gram[boundary] != boundaryChar:
                     continue
                 bareGram = method(gram)
@@ -241,7 +255,6 @@ class Gram:
                 if not CONSONANT_RE.match(main):
                     continue
                 other = bareGram[otherBoundary]
-                freq = self.occFreq(n, gram)
                 combis[main][other] += freq
                 allCombis[gram] = (main, other)
 
@@ -380,19 +393,18 @@ class Gram:
     def getLegalGrams(self, LIMIT):
         impureRe = self.impureRe
         caseRe = self.caseRe
-        GRAM = self.GRAM
         LEGAL_GRAMS = self.LEGAL_GRAMS
         ILLEGAL_GRAMS = self.ILLEGAL_GRAMS
         ALLOWED_GRAMS = self.ALLOWED_GRAMS
 
-        for (n, grams) in GRAM.items():
+        for n in NS:
             limit = LIMIT[n]
             theseAllowed = ALLOWED_GRAMS[n]
             theseAllowed.clear()
             allowed = LEGAL_GRAMS[False][n] | LEGAL_GRAMS[True][n]
             unAllowed = ILLEGAL_GRAMS[False][n] | ILLEGAL_GRAMS[True][n]
 
-            for gram in grams:
+            for (gram, freq) in self.gramFreqs(n):
                 if impureRe.search(gram) or caseRe.search(gram):
                     continue
 
@@ -402,7 +414,6 @@ class Gram:
                 if gram in unAllowed:
                     continue
 
-                freq = self.occFreq(n, gram)
                 if freq >= limit:
                     theseAllowed.add(gram)
 
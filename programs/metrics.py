@@ -0,0 +1,235 @@
+import os
+import sys
+import json
+import time
+import platform
+import resource
+import cProfile
+from datetime import datetime
+from contextlib import contextmanager, nullcontext
+from functools import wraps
+
+from tf.core.helpers import unexpanduser
+
+from config import Config
+
+
+PROFILERS = {"cprofile", "pyinstrument"}
+
+STATUS_FILE = "/proc/self/status"
+CLEAR_REFS_FILE = "/proc/self/clear_refs"
+
+
+def peakRss():
+    """The peak resident set size of this process in bytes.
+
+    On Linux this is the high water mark since the last `resetPeakRss()`,
+    elsewhere it is the peak since the start of the process.
+    """
+    if os.path.exists(STATUS_FILE):
+        with open(STATUS_FILE) as fh:
+            for line in fh:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+
+    maxRss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maxRss if sys.platform == "darwin" else maxRss * 1024
+
+
+def resetPeakRss():
+    try:
+        with open(CLEAR_REFS_FILE, "w") as fh:
+            fh.write("5")
+    except OSError:
+        pass
+
+
+class Metrics:
+    """Collects performance data of the stages of a run.
+
+    For every stage it records the wall time, the cpu time, the peak resident
+    memory and the number of items processed.
+    Stages may be nested, e.g. `analyseHeads` within `clean`.
+
+    Parameters
+    ----------
+    name: string
+        Name of the run, used in the names of the output files.
+    metricsDir: string, optional None
+        Where the metrics file and profiles go; by default `_local/metrics`.
+    profile: string, optional None
+        If `cprofile` or `pyinstrument`, every stage is profiled and the
+        profile is saved next to the metrics file.
+        Nested stages are part of the profile of the stage that contains them.
+    base: string, optional None
+        See `config.Config`; pass the same base as to `Hocr`, `convert` and `loadTf`,
+        so that the default `metricsDir` is in the `_local` of that base.
+    """
+
+    def __init__(self, name, metricsDir=None, profile=None, base=None):
+        if profile is not None and profile not in PROFILERS:
+            print(f"Unknown profiler {profile}, choose from {', '.join(PROFILERS)}")
+            profile = None
+        if profile == "pyinstrument":
+            try:
+                import pyinstrument  # noqa: F401
+            except ImportError:
+                print("pyinstrument is not installed, profiling with cProfile")
+                profile = "cprofile"
+
+        self.name = name
+        self.metricsDir = (
+            f"{Config(base=base).local}/metrics" if metricsDir is None else metricsDir
+        )
+        self.profile = profile
+        self.started = datetime.now()
+        self.runId = f"{name}-{self.started:%Y%m%d-%H%M%S}"
+        self.stages = []
+        self.active = []
+
+    @contextmanager
+    def stage(self, name, **context):
+        """Measure a stage.
+
+        Yields a dict with the record of the stage;
+        the caller can fill in the number of items processed.
+
+        Parameters
+        ----------
+        name: string
+            Name of the stage.
+        context: dict
+            Extra fields for the record of the stage, such as the volume.
+        """
+        active = self.active
+        if active:
+            parent = active[-1]
+            parent["peakRss"] = max(parent["peakRss"], peakRss())
+        resetPeakRss()
+
+        record = dict(stage=name, **context, items=None, peakRss=0)
+        self.stages.append(record)
+        active.append(record)
+
+        profiler = None
+        if self.profile is not None and len(active) == 1:
+            profiler = self.startProfile()
+
+        wallStart = time.perf_counter()
+        cpuStart = time.process_time()
+        try:
+            yield record
+        finally:
+            record["wall"] = time.perf_counter() - wallStart
+            record["cpu"] = time.process_time() - cpuStart
+            record["peakRss"] = max(record["peakRss"], peakRss())
+            items = record["items"]
+            record["itemsPerSecond"] = (
+                items / record["wall"] if items is not None and record["wall"] else None
+            )
+            if profiler is not None:
+                record["profile"] = self.stopProfile(profiler, name)
+            active.pop()
+            if active:
+                active[-1]["peakRss"] = max(active[-1]["peakRss"], record["peakRss"])
+
+    def startProfile(self):
+        if self.profile == "pyinstrument":
+            from pyinstrument import Profiler
+
+            profiler = Profiler()
+            profiler.start()
+        else:
+            profiler = cProfile.Profile()
+            profiler.enable()
+        return profiler
+
+    def stopProfile(self, profiler, name):
+        os.makedirs(self.metricsDir, exist_ok=True)
+        base = f"{self.metricsDir}/{self.runId}-{name}"
+        if self.profile == "pyinstrument":
+            profiler.stop()
+            profileFile = f"{base}.html"
+            with open(profileFile, "w") as fh:
+                fh.write(profiler.output_html())
+        else:
+            profiler.disable()
+            profileFile = f"{base}.prof"
+            profiler.dump_stats(profileFile)
+        return profileFile
+
+    def save(self):
+        """Write the metrics of this run to a JSON file.
+
+        Returns
+        -------
+        string
+            The path of the file.
+        """
+        os.makedirs(self.metricsDir, exist_ok=True)
+        metricsFile = f"{self.metricsDir}/{self.runId}.json"
+        data = dict(
+            run=self.name,
+            started=self.started.isoformat(timespec="seconds"),
+            python=platform.python_version(),
+            platform=platform.platform(),
+            cpus=os.cpu_count(),
+            stages=self.stages,
+        )
+        with open(metricsFile, "w") as fh:
+            json.dump(data, fh, indent=1)
+        print(f"Metrics written to {unexpanduser(metricsFile)}")
+        return metricsFile
+
+    def report(self):
+        print(
+            f"{'stage':<14} {'wall':>8} {'cpu':>8} {'peak MB':>8}"
+            f" {'items':>9} {'items/s':>10}"
+        )
+        for r in self.stages:
+            items = "" if r["items"] is None else r["items"]
+            perSec = (
+                "" if r["itemsPerSecond"] is None else f"{r['itemsPerSecond']:.0f}"
+            )
+            print(
+                f"{r['stage']:<14} {r['wall']:>8.3f} {r['cpu']:>8.3f}"
+                f" {r['peakRss'] / 1e6:>8.1f} {items:>9} {perSec:>10}"
+            )
+
+
+def stageOf(metrics, name, **context):
+    """Measure a stage if there are metrics, otherwise do nothing.
+
+    Yields a dict in which the number of items can be filled in.
+    """
+    return nullcontext({}) if metrics is None else metrics.stage(name, **context)
+
+
+def metered(name, items=None):
+    """Measure a method of an object with `metrics` and `volume` attributes.
+
+    Parameters
+    ----------
+    name: string
+        Name of the stage.
+    items: function, optional None
+        Given the object after the method has run, returns the number of
+        items processed by the stage.
+    """
+
+    def wrap(method):
+        @wraps(method)
+        def wrapped(self, *args, **kwargs):
+            with stageOf(self.metrics, name, volume=self.volume) as record:
+                result = method(self, *args, **kwargs)
+                if items is not None:
+                    try:
+                        record["items"] = items(self)
+                    except AttributeError:
+                        # the stage did not run, e.g. because of a missing config
+                        pass
+            return result
+
+        return wrapped
+
+    return wrap
@@ -0,0 +1,124 @@
+from functools import lru_cache
+
+from Levenshtein import ratio
+
+
+# the number of distinct words whose match with the months is remembered
+
+MATCH_CACHE_SIZE = 4096
+
+# the best match must have at least this ratio
+
+MATCH_MIN = 0.54
+
+
+def normalize(word):
+    """Lower case a word and strip the accents that the OCR tends to add."""
+    return word.lower().replace("ü", "u").replace("ë", "e").replace("é", "e")
+
+
+class MonthMatcher:
+    """Fuzzy matching of words with the month names of a volume.
+
+    A word is a month if it is listed as a variant of that month in the hints,
+    or if its ratio with that month is the best and clearly better than its ratio
+    with the other months.
+
+    The outcome for a word is remembered (up to `MATCH_CACHE_SIZE` words),
+    so repeated words, and repeated analyses of the same head lines,
+    do not compute the ratios again.
+
+    Parameters
+    ----------
+    months: iterable of string
+        The month names, in the order of the months, see `headconfig`.
+    hints: dict
+        Known variants of month names, keyed by the lower cased variant.
+    """
+
+    def __init__(self, months, hints, cacheSize=MATCH_CACHE_SIZE):
+        self.months = tuple(months)
+        self.hints = dict(hints)
+        self.scores = lru_cache(maxsize=cacheSize)(self.score)
+
+    def score(self, word):
+        """Score a normalized word against all month names.
+
+        Returns
+        -------
+        tuple
+            The index of the matching month or None,
+            a description of the best matches, and the ratios with all months.
+        """
+        rs = tuple(ratio(m, word) for m in self.months)
+
+        theI = None
+        maxR = max(rs)
+        maxI = rs.index(maxR)
+        hiRep = ""
+        if maxR >= MATCH_MIN:
+            diff = 0.04 if maxR >= 0.7 else 0.09 if maxR >= 0.6 else 0.12
+            threshold = maxR - diff
+            nHigh = sum(1 for r in rs if r >= threshold)
+            if nHigh == 1:
+                theI = maxI
+                hiRep = f" single match >= {threshold:>.2f}"
+            else:
+                hiRep = f" {nHigh} matches >= {threshold:.2f}"
+
+        return (theI, hiRep, rs)
+
+    def match(self, word, show=False):
+        """The month name that a word matches, or None.
+
+        Parameters
+        ----------
+        word: string
+            The word.
+        show: boolean, optional False
+            Whether to show the ratios with all months.
+        """
+        word = word.lower()
+        if word in self.hints:
+            return self.hints[word]
+
+        word = normalize(word)
+        (theI, hiRep, rs) = self.scores(word)
+
+        if show:
+            months = self.months
+            print(f"{word} best match {max(rs):.2f} {hiRep}")
+            for i in range(len(rs)):
+                print(f"\t{'OK' if i == theI else 'XX'} ~{rs[i]:.2f} {months[i]:<12}")
+        return None if theI is None else self.months[theI]
+
+    def matchAll(self, words):
+        """Match many words in one go.
+
+        Returns
+        -------
+        dict
+            The matching month name or None, keyed by the distinct words.
+        """
+        match = self.match
+        return {word: match(word) for word in set(words)}
+
+    def cacheInfo(self):
+        return self.scores.cache_info()
+
+
+MATCHERS = {}
+
+
+def monthMatcher(months, hints):
+    """The matcher for a table of months and hints, made only once per table.
+
+    Volumes with the same month configuration share their matcher,
+    and so do all analyses of the same volume.
+    """
+    key = (tuple(months), tuple(sorted(hints.items())))
+    matcher = MATCHERS.get(key, None)
+    if matcher is None:
+        matcher = MonthMatcher(months, hints)
+        MATCHERS[key] = matcher
+    return matcher
@@ -0,0 +1,298 @@
+import sys
+import json
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.error import HTTPError
+from urllib.parse import parse_qs, urlencode, urlparse
+from urllib.request import urlopen
+
+from config import Config
+from grams import Gram
+from tfFromTsv import loadTf
+from wordindex import wordIndex
+
+
+# The corpus server loads the TF of volumes, and the indexes that the notebooks
+# derive from it, once, and answers questions about them over HTTP on localhost,
+# in JSON. Start it with `python server.py 4` (or `serve([4])`), and ask it
+# with `CorpusClient`.
+
+HOST = "127.0.0.1"
+PORT = 8704
+
+
+class Corpus:
+    """The TF of a volume, with the indexes derived from it.
+
+    Everything is made when it is asked for the first time, and then kept.
+
+    Parameters
+    ----------
+    volume: integer
+        The volume.
+    base: string, optional None
+        See `config.Config`.
+    """
+
+    def __init__(self, volume, base=None):
+        self.volume = volume
+        self.base = base
+        self.lock = threading.RLock()
+        self.timings = {}
+        self.TF = None
+        self.occs = None
+        self.gram = None
+
+    def made(self, name, start):
+        self.timings[name] = round(time.perf_counter() - start, 3)
+
+    def api(self):
+        with self.lock:
+            if self.TF is None:
+                start = time.perf_counter()
+                TF = loadTf(self.volume, silent=True, base=self.base)
+                if not getattr(TF, "api", None):
+                    raise QueryError(404, f"no TF for volume {self.volume}")
+                self.TF = TF
+                self.made("tf", start)
+        return self.TF.api
+
+    def wordOccs(self):
+        """The slots of every word, see `wordindex.wordIndex()`.
+
+        This does not need the TF to be loaded.
+        """
+        with self.lock:
+            if self.occs is None:
+                start = time.perf_counter()
+                occs = wordIndex(self.volume, base=self.base)
+                if occs is None:
+                    raise QueryError(404, f"no TF for volume {self.volume}")
+                self.occs = occs
+                self.made("wordOccs", start)
+        return self.occs
+
+    def grams(self):
+        """The 4-grams of the words, with their frequencies, see `grams.Gram`."""
+        with self.lock:
+            if self.gram is None:
+                F = self.api().F
+                start = time.perf_counter()
+                gram = Gram([F.letters.v(w) for w in range(1, F.otype.maxSlot + 1)])
+                gram.getGrams()
+                self.gram = gram
+                self.made("grams", start)
+        return self.gram
+
+    def info(self):
+        return dict(
+            volume=self.volume,
+            maxSlot=None if self.TF is None else self.TF.api.F.otype.maxSlot,
+            words=None if self.occs is None else len(self.occs),
+            timings=self.timings,
+        )
+
+
+class CorpusServer:
+    """The volumes that are served, and the answers to the queries.
+
+    Every query is a method `q_name`, called with the parameters of the request,
+    as lists of strings. It returns data that can be dumped as JSON.
+    """
+
+    def __init__(self, base=None):
+        self.base = base
+        self.C = Config(base=base)
+        self.corpora = {}
+        self.lock = threading.Lock()
+        self.started = time.time()
+
+    def corpus(self, params):
+        try:
+            volume = int(params["volume"][0])
+        except (KeyError, ValueError):
+            raise QueryError(400, "specify a volume by number")
+        with self.lock:
+            corpus = self.corpora.get(volume, None)
+            if corpus is None:
+                if volume not in self.C.volumeInfo:
+                    raise QueryError(404, f"no volume {volume}")
+                corpus = Corpus(volume, base=self.base)
+                self.corpora[volume] = corpus
+        return corpus
+
+    def q_info(self, params):
+        return dict(
+            uptime=round(time.time() - self.started, 1),
+            volumes=[corpus.info() for corpus in self.corpora.values()],
+        )
+
+    def q_load(self, params):
+        """Make all indexes of a volume, so that later queries are fast."""
+        corpus = self.corpus(params)
+        corpus.wordOccs()
+        corpus.grams()
+        return corpus.info()
+
+    def q_occs(self, params):
+        """The slots of the given words, or of all words."""
+        occs = self.corpus(params).wordOccs()
+        words = params.get("word", occs)
+        return {word: occs.occs(word).tolist() for word in words}
+
+    def q_freqs(self, params):
+        """The number of occurrences of every word."""
+        return dict(self.corpus(params).wordOccs().freqs())
+
+    def q_text(self, params):
+        """The letters and punctuation of a range of slots."""
+        F = self.corpus(params).api().F
+        try:
+            first = int(params["first"][0])
+            last = int(params.get("last", params["first"])[0])
+        except (KeyError, ValueError):
+            raise QueryError(400, "specify the slots by first and last")
+        last = min(last, F.otype.maxSlot)
+        return [(F.letters.v(w), F.punc.v(w)) for w in range(max(first, 1), last + 1)]
+
+    def q_quality(self, params):
+        """The quality of the given words, or of all words, see `grams.Gram`."""
+        quality = self.corpus(params).grams().WORD_QUALITY
+        words = params.get("word", None)
+        if words is None:
+            return quality
+        return {word: quality.get(word, None) for word in words}
+
+    def q_grams(self, params):
+        """The grams of the given words, with their frequencies."""
+        gram = self.corpus(params).grams()
+        (index, freq) = (gram.GRAM_INDEX, gram.GRAM_FREQ)
+        return {
+            word: [(g, freq[g]) for g in index.get(word, [])]
+            for word in params.get("word", [])
+        }
+
+
+class QueryError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = getattr(self.server.corpusServer, f"q_{url.path.strip('/')}", None)
+        try:
+            if query is None:
+                raise QueryError(404, f"no query {url.path}")
+            (status, data) = (200, query(parse_qs(url.query)))
+        except QueryError as e:
+            (status, data) = (e.status, dict(error=str(e)))
+        except Exception as e:
+            (status, data) = (500, dict(error=f"{type(e).__name__}: {e}"))
+
+        body = json.dumps(data, ensure_ascii=False).encode("utf8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, fmt, *args):
+        pass
+
+
+def makeServer(volumes=(), host=HOST, port=PORT, base=None):
+    """Make a corpus server and load the given volumes with all their indexes.
+
+    Returns
+    -------
+    object
+        A `ThreadingHTTPServer`; call its `serve_forever()` to start serving.
+    """
+    corpusServer = CorpusServer(base=base)
+    for volume in volumes:
+        info = corpusServer.q_load(dict(volume=[str(volume)]))
+        print(f"volume {volume}: {info['words']} words, made in {info['timings']}")
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    server.corpusServer = corpusServer
+    return server
+
+
+def serve(volumes=(), host=HOST, port=PORT, base=None):
+    """Serve volumes until interrupted, see `makeServer()`."""
+    server = makeServer(volumes, host=host, port=port, base=base)
+    print(f"Serving on http://{host}:{port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+class CorpusClient:
+    """Ask a corpus server.
+
+    The first query for a volume that the server has not loaded yet
+    takes as long as loading it; all later queries are fast.
+
+    Parameters
+    ----------
+    host: string, optional HOST
+    port: integer, optional PORT
+    """
+
+    def __init__(self, host=HOST, port=PORT):
+        self.url = f"http://{host}:{port}"
+
+    def get(self, query, **params):
+        url = f"{self.url}/{query}?{urlencode(params, doseq=True)}"
+        try:
+            with urlopen(url) as response:
+                return json.load(response)
+        except HTTPError as e:
+            raise ValueError(json.load(e).get("error", str(e))) from None
+
+    def info(self):
+        return self.get("info")
+
+    def load(self, volume):
+        return self.get("load", volume=volume)
+
+    def wordOccs(self, volume, words=None):
+        """The slots per word: a dict like the `wordOccs` of the notebooks."""
+        if words is None:
+            return self.get("occs", volume=volume)
+        return self.get("occs", volume=volume, word=list(words))
+
+    def freqs(self, volume):
+        return self.get("freqs", volume=volume)
+
+    def text(self, volume, first, last=None):
+        """The (letters, punc) of the slots from first to last."""
+        last = first if last is None else last
+        data = self.get("text", volume=volume, first=first, last=last)
+        return [tuple(x) for x in data]
+
+    def quality(self, volume, words=None):
+        if words is None:
+            return self.get("quality", volume=volume)
+        return self.get("quality", volume=volume, word=list(words))
+
+    def grams(self, volume, words):
+        return self.get("grams", volume=volume, word=list(words))
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    port = PORT
+    if "--port" in args:
+        i = args.index("--port")
+        port = int(args[i + 1])
+        args = args[0:i] + args[i + 2 :]
+    serve([int(a) for a in args], port=port)
@@ -0,0 +1,223 @@
+import os
+import random
+
+from config import Config, VOLUME_INFO
+
+
+SYNTHETIC_VOLUME = 999
+
+MONTHS = """
+Januarius
+Februarius
+Martius
+April
+Mayus
+Junius
+Julius
+Augusto
+September
+October
+November
+December
+""".strip().split()
+
+VOCABULARY = """
+den dito de het van ende met een schip naer Batavia gouverneur generael
+ontfangen brieff jacht Oppercoopman rijcxdaelders peper Choromandel comptoir
+'s lands d'Engelsen 't volck (Japan) capiteyn vrede oorloge 1640 onse
+""".strip().split()
+
+PUNCTUATION = ("", "", "", ",", ".", ";")
+
+FOOTERS = (
+    ("Digitized", "by", "Google"),
+    ("Digitized", "by", "Google"),
+    ("Diglized", "by", "Googlc"),
+    ("Digilized", "byGoogle"),
+)
+
+HEADER = """
+<?xml version="1.0" encoding="UTF-8"?>
+<!DOCTYPE html>
+<html>
+<head>
+<title></title>
+<meta charset="utf-8" />
+</head>
+<body>
+""".strip().split("\n")
+
+FOOTER = ["</body>", "</html>"]
+
+
+def esc(text):
+    return (
+        text.replace("&", "&amp;")
+        .replace("<", "&lt;")
+        .replace(">", "&gt;")
+        .replace('"', "&quot;")
+    )
+
+
+def generate(path, pages, seed=1):
+    """Write a synthetic HOCR file in the shape of the Daghregister sources.
+
+    Every page has a header line with a page number and a date range,
+    a text area with 8 to 14 lines of words, mostly followed by a
+    (sometimes misrecognized) "Digitized by Google" line.
+    Some text areas are tables, some pages have a photo.
+    Words consist of character spans with boxes and confidences; a few of the
+    spaces between words are thin spaces.
+
+    Parameters
+    ----------
+    path: string
+        The file to write.
+    pages: integer
+        The number of pages.
+    seed: integer, optional 1
+        Seed of the random generator: the same seed gives the same file.
+    """
+    rnd = random.Random(seed)
+    out = list(HEADER)
+    (year, month, day) = (1640, 3, 1)
+
+    for p in range(1, pages + 1):
+        out.append(
+            f'<div class="ocr_page" id="page_{p}"'
+            f' title="bbox 0 0 2480 3508; ppageno {p - 1}">'
+        )
+        y = 100
+
+        dayTo = min(day + rnd.randint(0, 2), 28)
+        monthName = MONTHS[month - 1]
+        head = (
+            f"Anno {year} {monthName} {day}-{dayTo}. {p}"
+            if p % 2 == 0
+            else f"{p} Anno {year}. {monthName} {day}-{dayTo}"
+        )
+        day = dayTo + 1
+        if day > 28:
+            day = 1
+            month += 1
+            if month > 12:
+                month = 1
+                year += 1
+
+        lines = [head.split()]
+        for _ in range(rnd.randint(8, 14)):
+            lines.append(
+                [
+                    rnd.choice(VOCABULARY) + rnd.choice(PUNCTUATION)
+                    for _ in range(rnd.randint(4, 9))
+                ]
+            )
+        footer = rnd.choice(FOOTERS)
+        if rnd.random() < 0.05:
+            footer = ()
+        if rnd.random() < 0.1:
+            out.append(f'<div class="ocr_photo" id="photo_{p}" title="bbox 10 10 40 40" />')
+
+        blocks = [lines[0:1], lines[1:]]
+        if footer:
+            blocks.append([footer])
+
+        for (b, block) in enumerate(blocks):
+            isTable = b == 1 and rnd.random() < 0.1
+            bbox = f"bbox 100 {y} 2300 {y + 100}"
+            if isTable:
+                out.extend(["<table>", "<tr>", "<td>"])
+            else:
+                out.append(f'<div class="ocr_carea" id="block_{p}_{b}" title="{bbox}">')
+            out.append(f'<p class="ocr_par" id="par_{p}_{b}" lang="nld" title="{bbox}">')
+
+            for (ln, words) in enumerate(block):
+                size = 30 if b == 2 else 40
+                out.append(
+                    f'<span class="ocr_line" id="line_{p}_{b}_{ln}"'
+                    f' title="bbox 100 {y} 2300 {y + size}; baseline 0.001 -8;'
+                    f' x_size {size}; x_descenders 8; x_ascenders 10">'
+                )
+                x = 100
+                for (w, word) in enumerate(words):
+                    x0 = x
+                    chars = []
+                    for c in word:
+                        width = rnd.randint(14, 26)
+                        chars.append((c, x, x + width))
+                        x += width
+                    if w < len(words) - 1:
+                        width = (
+                            rnd.randint(4, 9)
+                            if rnd.random() < 0.04
+                            else rnd.randint(12, 30)
+                        )
+                        chars.append((" ", x, x + width))
+                        x += width
+                    out.append(
+                        f'<span class="ocrx_word" id="word_{p}_{b}_{ln}_{w}"'
+                        f' title="bbox {x0} {y} {x} {y + size};'
+                        f' x_wconf {rnd.randint(50, 99)}">'
+                    )
+                    for (c, left, right) in chars:
+                        out.append(
+                            f'<span class="ocrx_cinfo" title="x_bboxes {left} {y}'
+                            f" {right} {y + size}; x_conf {rnd.uniform(30, 100):.6f}"
+                            f'">{esc(c)}</span>'
+                        )
+                    out.append("</span>")
+                out.append("</span>")
+                y += size + 20
+
+            out.append("</p>")
+            if isTable:
+                out.extend(["</td>", "</tr>", "</table>"])
+            else:
+                out.append("</div>")
+            y += 40
+
+        out.append("</div>")
+
+    out.extend(FOOTER)
+
+    with open(path, "w") as fh:
+        fh.write("\n".join(out) + "\n")
+
+
+def makeVolume(base, pages, volume=SYNTHETIC_VOLUME, seed=1):
+    """Set up a synthetic volume in a directory that stands in for the repository.
+
+    The volume is added to the volume configuration, with all its pages
+    in the text, and its HOCR source is generated.
+
+    Parameters
+    ----------
+    base: string
+        The directory, to be passed as `base` to `Config`, `hocr.Hocr` and
+        `tfFromTsv.convert`.
+    pages: integer
+        The number of pages.
+    volume: integer, optional SYNTHETIC_VOLUME
+        The volume number.
+    seed: integer, optional 1
+        Seed of the random generator.
+
+    Returns
+    -------
+    string
+        The path of the HOCR source.
+    """
+    VOLUME_INFO[volume] = dict(
+        volume="Synthetic",
+        years="1640",
+        editor="",
+        publisher="",
+        published="",
+        startPage=1,
+        endPage=-1,
+    )
+    C = Config(base=base)
+    os.makedirs(C.local, exist_ok=True)
+    source = f"{C.local}/{C.volumeName(volume)}_chocr.html"
+    generate(source, pages, seed=seed)
+    return source
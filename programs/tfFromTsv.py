@@ -1,11 +1,20 @@
+import os
+import io
 import collections
 import re
+import time
+import tempfile
+from array import array
+from contextlib import redirect_stdout
+from functools import partial
 
 from tf.fabric import Fabric
 from tf.convert.walker import CV
-from tf.core.helpers import unexpanduser
+from tf.core.helpers import tfFromValue, unexpanduser
 
 from config import Config
+from metrics import stageOf
+from tffiles import TfFiles, pageHashes, readState, removeState, stateFile, writeState
 
 C = Config()
 
@@ -81,101 +90,201 @@ FEATURE_META = {
 }
 
 
-def convert(volume):
-    global VOLUME
-    global SRC_FILE
-    global HEADER_FILE
+def convert(volume, metrics=None, base=None, direct=True, incremental=False):
+    """Convert the word file and head line file of a volume to TF.
+
+    Parameters
+    ----------
+    volume: integer
+        The volume to convert.
+    metrics: object, optional None
+        A `metrics.Metrics` object to record the conversion in.
+    base: string, optional None
+        Work in this directory instead of the clone of the repository,
+        see `config.Config`.
+    direct: boolean, optional True
+        If True, the TF files are written by `writeDirect()`; otherwise
+        by the walker of Text-Fabric, driven by `director()`.
+        The results are the same, see `checkDirect()`.
+    incremental: boolean, optional False
+        If True, only the TF files whose contents change are written,
+        see `writeIncremental()`; only with `direct`.
+
+    Returns
+    -------
+    boolean
+        Whether the conversion succeeded.
+    """
+    C = Config(base=base)
 
     if not C.checkVolume(volume):
         return
 
-    VOLUME = volume
+    (srcFile, headerFile) = sourceFiles(C, volume)
+    DEST = f"{C.tfDir}/{volume:>03}/{C.tfVersion}"
+    statePath = stateFile(volume, base=base)
 
-    SRC_FILE = f"{C.local}/{C.volumeName(VOLUME)}_words.tsv"
-    HEADER_FILE = f"{C.auxDir}/{C.volumeNameNum(volume)}/heads.tsv"
+    with stageOf(metrics, "convert", volume=volume) as record:
+        if direct:
+            (good, nSlots) = writeIncremental(
+                C, volume, srcFile, headerFile, DEST, statePath, incremental=incremental
+            )
+        else:
+            # the walker does not keep track of what it writes
+            removeState(statePath)
+            (good, nSlots) = walk(C, volume, srcFile, headerFile, DEST)
+        record["items"] = nSlots
 
-    tfVersion = C.tfVersion
-    tfDir = f"{C.tfDir}/{VOLUME:>03}"
-    DEST = f"{tfDir}/{tfVersion}"
-    cv = CV(Fabric(locations=DEST))
+    return good
 
-    return cv.walk(
-        director,
+
+def sourceFiles(C, volume):
+    srcFile = f"{C.local}/{C.volumeName(volume)}_words.tsv"
+    headerFile = f"{C.auxDir}/{C.volumeNameNum(volume)}/heads.tsv"
+    return (srcFile, headerFile)
+
+
+def walk(C, volume, srcFile, headerFile, dest):
+    """Convert a volume by means of the walker of Text-Fabric.
+
+    Returns
+    -------
+    tuple
+        Whether the conversion succeeded, and the number of slots.
+    """
+    cv = CV(Fabric(locations=dest))
+
+    # the volume and its files are passed to the director instead of being
+    # kept in globals, so that several volumes can be converted in one process
+
+    good = cv.walk(
+        partial(director, volume=volume, srcFile=srcFile, headerFile=headerFile),
         SLOT_TYPE,
         otext=OTEXT,
-        generic=GENERIC | C.volumeInfo[VOLUME],
+        generic=GENERIC | C.volumeInfo[volume],
         intFeatures=INT_FEATURES,
         featureMeta=FEATURE_META,
         generateTf=True,
     )
+    return (good, cv.curSeq.get(SLOT_TYPE, 0))
 
 
-# DIRECTOR
+# SOURCE
 
 
-def director(cv):
-    """Read TSV data fields.
+def readRows(srcFile):
+    """Read the word file row by row.
 
-    This is a function that does the work as indicated in the
-    [walker conversion engine of Text-Fabric](https://annotation.github.io/text-fabric/tf/convert/walker.html)
-    See `fusus.convert` for a description of the fields in the TSV files.
+    Yields
+    ------
+    tuple
+        The rows of the word file, as tuples (page, para, line, letters, punc, conf).
     """
+    with open(srcFile) as fh:
+        next(fh)
+        for line in fh:
+            row = line.rstrip("\n").split(SEP)
+            yield (int(row[1]), int(row[3]), int(row[4]), row[6], row[7], row[8])
 
-    errors = collections.defaultdict(set)
 
-    cur = [None, None, None]
-    prev = [None, None, None]
-    nSec = len(prev)
+# an integer feature of a page that has no value
 
-    data = []
+NO_VALUE = -1
 
-    with open(SRC_FILE) as fh:
-        next(fh)
-        for line in fh:
-            row = line.rstrip("\n").split(SEP)[1:]
-            page = int(row[0])
-            para = int(row[2])
-            line = int(row[3])
-            letters = row[5]
-            punc = row[6]
-            conf = row[7]
-            row = (page, para, line, letters, punc, conf)
-            data.append(row)
-
-    headerLines = {}
-
-    with open(HEADER_FILE) as fh:
-        next(fh)
-        for line in fh:
-            (pageNum, side, okRep, year, month, dayFrom, dayTo, head) = line.rstrip(
-                "\n"
-            ).split("\t")
-
-            headerLines[int(pageNum)] = dict(
-                side=side,
-                year=int(year) if year else None,
-                month=int(month) if month else None,
-                dayfrom=int(dayFrom) if dayFrom else None,
-                dayto=int(dayTo) if dayTo else None,
-                head=head if head else None,
-            )
 
-    vol = cv.node("volume")
-    cv.feature(vol, n=VOLUME, years=C.volumeInfo[VOLUME]["years"])
-    s = None
+class PageHeads:
+    """The features of the pages, from the head line file, indexed by page number.
+
+    The integer features are kept in arrays with a slot for every page number,
+    so that looking up a page is indexing, and the memory is a few bytes per page.
+
+    Parameters
+    ----------
+    headerFile: string
+        The head line file of a volume.
+    """
+
+    INT_FIELDS = ("year", "month", "dayfrom", "dayto")
+
+    def __init__(self, headerFile):
+        entries = {}
+
+        with open(headerFile) as fh:
+            next(fh)
+            for line in fh:
+                (pageNum, side, okRep, year, month, dayFrom, dayTo, head) = line.rstrip(
+                    "\n"
+                ).split("\t")
+                entries[int(pageNum)] = (side, year, month, dayFrom, dayTo, head)
+
+        size = max(entries, default=-1) + 1
+        self.present = bytearray(size)
+        self.side = [None] * size
+        self.head = [None] * size
+        ints = {feat: array("i", [NO_VALUE]) * size for feat in self.INT_FIELDS}
+        self.ints = ints
+
+        for (page, (side, year, month, dayFrom, dayTo, head)) in entries.items():
+            self.present[page] = 1
+            self.side[page] = side
+            self.head[page] = head if head else None
+            for (feat, value) in zip(self.INT_FIELDS, (year, month, dayFrom, dayTo)):
+                if value:
+                    ints[feat][page] = int(value)
+
+    def __contains__(self, page):
+        return 0 <= page < len(self.present) and self.present[page] == 1
+
+    def features(self, page):
+        """The features of a page, with None for missing values.
+
+        Raises
+        ------
+        KeyError
+            If the page has no row in the head line file.
+        """
+        if page not in self:
+            raise KeyError(page)
+        features = dict(side=self.side[page])
+        for (feat, values) in self.ints.items():
+            value = values[page]
+            features[feat] = None if value == NO_VALUE else value
+        features["head"] = self.head[page]
+        return features
+
+
+# the kinds of events in the structure of a volume, see `events()`
+
+SECTION = "section"
+SLOT = "slot"
+PUNC = "punc"
+
+
+def events(rows):
+    """Turn the rows of the word file into the structure of the volume.
+
+    The rows are consumed one by one, so they can come from `readRows()`.
+
+    Both the director of the walker and the direct writer follow this
+    sequence of events:
+
+    *   `(SECTION, i, row)`: the section levels from `i` on end
+        (the levels are those of `TYPE_MAP`), and new ones start,
+        numbered by the fields of the row;
+    *   `(SLOT, letters, punc)`: a new slot;
+    *   `(PUNC, punc)`: the punctuation of the last slot changes.
+
+    Words are split at commas, and some prefixes and opening brackets are
+    split off; rows without letters only add their punctuation to the last slot.
+    """
+    prev = [None, None, None]
+    nSec = len(prev)
+    lastPunc = None
 
-    for (r, fields) in enumerate(data):
+    for fields in rows:
         for i in range(nSec):
             if fields[i] != prev[i]:
-                for j in reversed(range(i, nSec)):
-                    cv.terminate(cur[j])
-                    prev[j] = 0
-                for j in range(i, nSec):
-                    cn = cv.node(TYPE_MAP[j])
-                    cv.feature(cn, n=fields[j])
-                    if j == 0:
-                        cv.feature(cn, **headerLines[fields[j]])
-                    cur[j] = cn
+                yield (SECTION, i, fields)
                 break
         for i in range(nSec):
             prev[i] = fields[i]
@@ -183,10 +292,11 @@ def director(cv):
         letters = fields[3]
         punc = fields[4]
         if letters == "":
-            previousPunc = cv.get("punc", s)
+            previousPunc = lastPunc
             if not previousPunc.endswith(" ") or not punc.startswith(" "):
                 punc = f"{previousPunc}{punc}"
-            cv.feature(s, punc=SPACE_RE.sub(punc, " "))
+            lastPunc = SPACE_RE.sub(punc, " ")
+            yield (PUNC, lastPunc)
             continue
 
         parts = letters.split(",")
@@ -201,21 +311,65 @@ def director(cv):
                 or part[0].lower() in {"d", "t"}
                 and part[1] == "'"
             ):
-                s = cv.slot()
-                cv.feature(s, letters=part[0:2], punc=" ")
-                s = cv.slot()
-                cv.feature(s, letters=part[2:], punc=thisPunc)
+                yield (SLOT, part[0:2], " ")
+                yield (SLOT, part[2:], thisPunc)
+                lastPunc = thisPunc
             elif part[0] == "(":
-                previousPunc = cv.get("punc", s)
+                previousPunc = lastPunc
                 if len(part) == 1:
-                    cv.feature(s, punc=f"{previousPunc}({thisPunc}")
+                    lastPunc = f"{previousPunc}({thisPunc}"
+                    yield (PUNC, lastPunc)
                 else:
-                    cv.feature(s, punc=f"{previousPunc}(")
-                    s = cv.slot()
-                    cv.feature(s, letters=part[1:], punc=thisPunc)
+                    yield (PUNC, f"{previousPunc}(")
+                    yield (SLOT, part[1:], thisPunc)
+                    lastPunc = thisPunc
             else:
-                s = cv.slot()
-                cv.feature(s, letters=part, punc=thisPunc)
+                yield (SLOT, part, thisPunc)
+                lastPunc = thisPunc
+
+
+# DIRECTOR
+
+
+def director(cv, volume, srcFile, headerFile):
+    """Read TSV data fields.
+
+    This is a function that does the work as indicated in the
+    [walker conversion engine of Text-Fabric](https://annotation.github.io/text-fabric/tf/convert/walker.html)
+    See `fusus.convert` for a description of the fields in the TSV files.
+
+    The rows of the word file are read while the walker goes, so the first
+    nodes are made right away, and the rows are not all in memory at the same time.
+    """
+
+    errors = collections.defaultdict(set)
+
+    cur = [None, None, None]
+    nSec = len(cur)
+
+    heads = PageHeads(headerFile)
+
+    vol = cv.node("volume")
+    cv.feature(vol, n=volume, years=C.volumeInfo[volume]["years"])
+    s = None
+
+    for event in events(readRows(srcFile)):
+        kind = event[0]
+        if kind == SLOT:
+            s = cv.slot()
+            cv.feature(s, letters=event[1], punc=event[2])
+        elif kind == PUNC:
+            cv.feature(s, punc=event[1])
+        else:
+            (kind, i, fields) = event
+            for j in reversed(range(i, nSec)):
+                cv.terminate(cur[j])
+            for j in range(i, nSec):
+                cn = cv.node(TYPE_MAP[j])
+                cv.feature(cn, n=fields[j])
+                if j == 0:
+                    cv.feature(cn, **heads.features(fields[j]))
+                cur[j] = cn
 
     for i in reversed(range(nSec)):
         if cur[i]:
@@ -236,10 +390,403 @@ def director(cv):
             print(", ".join(showInstances))
 
 
+# DIRECT WRITER
+
+
+def writeDirect(C, volume, srcFile, headerFile, dest, files=None):
+    """Convert a volume by writing the TF files directly.
+
+    Our structure is a fixed hierarchy: a volume with pages, paras and lines,
+    where every node covers a consecutive range of slots.
+    So instead of passing every slot and feature through the walker,
+    we follow the `events()`, write the slot features to their files as the
+    slots come in, keep the other nodes as slot ranges, and write their
+    files at the end.
+    The result is the same as that of the walker: nodes without slots are left
+    out, the node types come after the slots in alphabetical order, and the
+    files have the same metadata, in the format of `tf.core.data`.
+
+    Parameters
+    ----------
+    files: object, optional None
+        A `tffiles.TfFiles` object to write with; if None, all files are
+        written anew.
+
+    Returns
+    -------
+    tuple
+        Whether the conversion succeeded, and the number of slots.
+    """
+    if files is None:
+        files = TfFiles(dest)
+    heads = PageHeads(headerFile)
+    generic = GENERIC | C.volumeInfo[volume]
+
+    # per section level: the first and last slot of each node, and its number
+
+    nSec = len(TYPE_MAP)
+    firsts = [array("I") for j in range(nSec)]
+    lasts = [array("I") for j in range(nSec)]
+    nums = [array("i") for j in range(nSec)]
+
+    letterWriter = SlotWriter(files, "letters", generic | featureMeta("letters"))
+    puncWriter = SlotWriter(files, "punc", generic | featureMeta("punc"))
+    nSlots = 0
+
+    with letterWriter, puncWriter:
+        for event in events(readRows(srcFile)):
+            kind = event[0]
+            if kind == SLOT:
+                letterWriter.add(event[1])
+                puncWriter.add(event[2])
+                nSlots += 1
+            elif kind == PUNC:
+                puncWriter.change(event[1])
+            else:
+                (kind, i, fields) = event
+                for j in range(i, nSec):
+                    if nums[j]:
+                        lasts[j].append(nSlots)
+                    firsts[j].append(nSlots + 1)
+                    nums[j].append(fields[j])
+
+    maxSlot = nSlots
+    for j in range(nSec):
+        if nums[j]:
+            lasts[j].append(maxSlot)
+
+    # the nodes per type, as (first slot, last slot, features), without the
+    # nodes that have no slots
+
+    typeNodes = {
+        "volume": [
+            (1, maxSlot, dict(n=volume, years=C.volumeInfo[volume]["years"]))
+        ]
+    }
+    for j in range(nSec):
+        nodes = []
+        for (first, last, num) in zip(firsts[j], lasts[j], nums[j]):
+            if first > last:
+                continue
+            features = dict(n=num)
+            if j == 0:
+                features.update(heads.features(num))
+            nodes.append((first, last, features))
+        typeNodes[TYPE_MAP[j]] = nodes
+
+    otype = [(1, maxSlot, SLOT_TYPE)]
+    oslots = []
+    nodeFeatures = collections.defaultdict(list)
+
+    n = maxSlot
+    for nType in sorted(typeNodes):
+        nodes = typeNodes[nType]
+        if not nodes:
+            continue
+        otype.append((n + 1, n + len(nodes), nType))
+        for (first, last, features) in nodes:
+            n += 1
+            oslots.append((n, first, last))
+            if nType == TYPE_MAP[0]:
+                files.pageNodes[features["n"]] = n
+            for (feat, value) in features.items():
+                if value is not None:
+                    nodeFeatures[feat].append((n, value))
+
+    strMeta = generic | dict(valueType="str")
+    files.write("otype", "node", strMeta, otypeLines(otype))
+    files.write("oslots", "edge", strMeta, oslotsLines(oslots))
+    files.write("otext", "config", generic | OTEXT, [])
+    for (feat, featureData) in sorted(nodeFeatures.items()):
+        files.write(feat, "node", generic | featureMeta(feat), nodeLines(featureData))
+    files.removeRest()
+
+    print(f"{maxSlot} slots and {n - maxSlot} other nodes written to {unexpanduser(dest)}")
+    return (True, maxSlot)
+
+
+def featureMeta(feat):
+    return FEATURE_META[feat] | dict(valueType="int" if feat in INT_FEATURES else "str")
+
+
+# the slot writer writes its values in chunks of this many slots
+
+SLOT_CHUNK = 1 << 14
+
+
+class SlotWriter:
+    """Write a feature with a string value for every slot, while the slots come in.
+
+    The value of the last slot can still be changed, until the next slot comes,
+    so the writer keeps back the last value when it writes a chunk.
+    If no slot comes at all, no file is left behind, as with the walker.
+    """
+
+    def __init__(self, files, feat, meta):
+        self.fh = files.open(feat, "node", meta)
+        self.values = []
+        self.n = 0
+
+    def add(self, value):
+        values = self.values
+        values.append(value)
+        self.n += 1
+        if len(values) > SLOT_CHUNK:
+            self.flush(keep=1)
+
+    def change(self, value):
+        self.values[-1] = value
+
+    def flush(self, keep=0):
+        values = self.values
+        split = len(values) - keep
+        self.fh.writelines(slotLines(values[0:split]))
+        self.values = values[split:]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, *exc):
+        if excType is None:
+            self.flush()
+            self.fh.close(keep=self.n > 0)
+        else:
+            self.fh.__exit__(excType, *exc)
+
+
+# INCREMENTAL CONVERSION
+
+# the page features that come from the head line file
+
+HEAD_FEATURES = ("side", "year", "month", "dayfrom", "dayto", "head")
+
+
+def writeIncremental(C, volume, srcFile, headerFile, dest, statePath, incremental=True):
+    """Convert a volume directly, and only replace the TF files that change.
+
+    The rows of the word file and the head line file are hashed per page, and
+    compared with the hashes of the last conversion.
+    If only head lines have changed, only the page features that come from them
+    are computed again, from the head line file and the nodes of the pages;
+    otherwise everything is computed by `writeDirect()`.
+    Either way, only the files whose contents change are written,
+    the others keep their contents and modification time.
+
+    Parameters
+    ----------
+    statePath: string
+        The file with the state of the last conversion, see `tffiles.stateFile()`.
+    incremental: boolean, optional True
+        If False, all files are written; the state is still saved,
+        for the next incremental conversion.
+
+    Returns
+    -------
+    tuple
+        Whether the conversion succeeded, and the number of slots.
+    """
+    state = readState(statePath) if incremental else None
+    (words, heads) = pageHashes(srcFile, headerFile)
+    generic = GENERIC | C.volumeInfo[volume]
+
+    # the metadata and configuration go into the header of every file,
+    # the files change anyway if they change
+
+    if state is not None and state["config"] != repr(generic):
+        print("The metadata have changed: converting everything")
+        state = None
+
+    files = TfFiles(dest, previous=None if state is None else state["features"])
+
+    if state is None:
+        if incremental:
+            print("No state of a previous conversion: converting everything")
+        (good, nSlots) = writeDirect(C, volume, srcFile, headerFile, dest, files=files)
+    else:
+        wordPages = changedPages(state["words"], words)
+        headPages = changedPages(state["heads"], heads)
+        print(
+            f"{len(wordPages)} pages with other words{pageList(wordPages)}, "
+            f"{len(headPages)} pages with another head line{pageList(headPages)}"
+        )
+        if wordPages or not all(files.intact(feat) for feat in state["features"]):
+            (good, nSlots) = writeDirect(
+                C, volume, srcFile, headerFile, dest, files=files
+            )
+        else:
+            files.pageNodes = state["pageNodes"]
+            good = writePageHeads(files, PageHeads(headerFile), generic)
+            nSlots = state["slots"]
+        files.report()
+
+    if good:
+        writeState(
+            statePath,
+            dict(
+                config=repr(generic),
+                slots=nSlots,
+                words=words,
+                heads=heads,
+                pageNodes=files.pageNodes,
+                features=files.state(),
+            ),
+        )
+    return (good, nSlots)
+
+
+def writePageHeads(files, heads, generic):
+    """Write the page features that come from the head lines, for existing nodes."""
+    nodeFeatures = collections.defaultdict(list)
+    for (page, node) in sorted(files.pageNodes.items(), key=lambda x: x[1]):
+        for (feat, value) in heads.features(page).items():
+            if value is not None:
+                nodeFeatures[feat].append((node, value))
+
+    for feat in HEAD_FEATURES:
+        featureData = nodeFeatures[feat]
+        if featureData:
+            meta = generic | featureMeta(feat)
+            files.write(feat, "node", meta, nodeLines(featureData))
+        else:
+            files.remove(feat)
+    return True
+
+
+def changedPages(old, new):
+    """The pages whose hashes differ, including pages that come or go."""
+    return sorted(
+        page for page in old.keys() | new.keys() if old.get(page) != new.get(page)
+    )
+
+
+def pageList(pages, limit=10):
+    if not pages:
+        return ""
+    more = " ..." if len(pages) > limit else ""
+    return f" ({', '.join(str(p) for p in pages[0:limit])}{more})"
+
+
+def spec(first, last):
+    return f"{first}" if first == last else f"{first}-{last}"
+
+
+def otypeLines(otype):
+    implicitNode = 1
+    for (first, last, nType) in otype:
+        nodeSpec = "" if first == last == implicitNode else spec(first, last)
+        implicitNode = last
+        yield f"{nodeSpec}{SEP if nodeSpec else ''}{nType}\n"
+
+
+def oslotsLines(oslots):
+    implicitNode = 1
+    for (n, first, last) in oslots:
+        nodeSpec = "" if n == implicitNode else n
+        implicitNode = n + 1
+        yield f"{nodeSpec}{SEP if nodeSpec else ''}{spec(first, last)}\n"
+
+
+def slotLines(values):
+    """The data lines of a feature with a string value for every slot."""
+    if not values:
+        return []
+    text = "\n".join(values)
+    if "\\" in text or "\t" in text or text.count("\n") != len(values) - 1:
+        text = "\n".join(tfFromValue(value) for value in values)
+    return [text, "\n"]
+
+
+def nodeLines(featureData):
+    implicitNode = 1
+    for (n, value) in featureData:
+        nodeSpec = "" if n == implicitNode else n
+        implicitNode = n + 1
+        yield f"{nodeSpec}{SEP if nodeSpec else ''}{tfFromValue(value)}\n"
+
+
+def checkDirect(volume, base=None):
+    """Check that the direct writer and the walker produce the same TF files.
+
+    Both write to a temporary directory; the files are compared, apart from the
+    time at which they have been written.
+
+    Returns
+    -------
+    boolean
+        Whether all files are the same.
+    """
+    C = Config(base=base)
+
+    if not C.checkVolume(volume):
+        return
+
+    (srcFile, headerFile) = sourceFiles(C, volume)
+    good = True
+
+    with tempfile.TemporaryDirectory() as tmpDir:
+        timings = {}
+        for (method, writer) in (("walker", walk), ("direct", writeDirect)):
+            start = time.perf_counter()
+            with redirect_stdout(io.StringIO()):
+                writer(C, volume, srcFile, headerFile, f"{tmpDir}/{method}")
+            timings[method] = time.perf_counter() - start
+
+        files = {
+            method: sorted(
+                f for f in os.listdir(f"{tmpDir}/{method}") if f.endswith(".tf")
+            )
+            for method in timings
+        }
+        if files["walker"] != files["direct"]:
+            print(f"Different files: {files['walker']} versus {files['direct']}")
+            good = False
+
+        for f in files["walker"]:
+            contents = {}
+            for method in timings:
+                path = f"{tmpDir}/{method}/{f}"
+                if not os.path.exists(path):
+                    continue
+                with open(path) as fh:
+                    contents[method] = [
+                        line for line in fh if not line.startswith("@dateWritten=")
+                    ]
+            if len(contents) == 2 and contents["walker"] != contents["direct"]:
+                print(f"{f}: different")
+                good = False
+
+    print(
+        f"{'All' if good else 'NOT all'} {len(files['walker'])} files are the same;"
+        f" walker {timings['walker']:.2f}s, direct {timings['direct']:.2f}s"
+    )
+    return good
+
+
 # TF LOADING (to test the generated TF)
 
 
-def loadTf(volume, silent=False):
+def loadTf(
+    volume, silent=False, metrics=None, base=None, features=None, lazy=False
+):
+    """Load the TF of a volume.
+
+    Parameters
+    ----------
+    features: iterable of string, optional None
+        The features to load; if None, all features (or none, if `lazy`).
+        Text-Fabric always loads the features that the text and the sections
+        need as well: `otype`, `oslots`, `otext`, `n`, `letters` and `punc`.
+    lazy: boolean, optional False
+        If True, the other features are loaded when they are used for the
+        first time, see `LazyTf`.
+
+    Returns
+    -------
+    object
+        The `Fabric` object with the loaded features, or a `LazyTf` around it.
+    """
+    C = Config(base=base)
+
     if not C.checkVolume(volume):
         return
 
@@ -250,13 +797,82 @@ def loadTf(volume, silent=False):
     DEST = f"{tfDir}/{tfVersion}"
     print(f"Loading tf data from {unexpanduser(DEST)}")
 
-    TF = Fabric(locations=[DEST], silent=True)
-    allFeatures = TF.explore(silent=True, show=True)
-    loadableFeatures = allFeatures["nodes"] + allFeatures["edges"]
-    api = TF.load(loadableFeatures, silent=silent)
+    with stageOf(metrics, "loadTf", volume=volume) as record:
+        TF = Fabric(locations=[DEST], silent=True)
+        allFeatures = TF.explore(silent=True, show=True)
+        loadableFeatures = allFeatures["nodes"] + allFeatures["edges"]
+        if features is None:
+            features = [] if lazy else loadableFeatures
+        api = TF.load(features, silent=silent)
+        if api:
+            record["items"] = api.F.otype.maxNode
+            if lazy:
+                TF = LazyTf(TF, loadableFeatures)
+                api = TF.api
+
     if api and not silent:
         print(f"max node = {api.F.otype.maxNode}")
         print("Frequencies of words")
         for (word, n) in api.F.letters.freqList()[0:20]:
             print(f"{n:>6} x {word}")
     return TF
+
+
+class LazyTf:
+    """A corpus in Text-Fabric of which the features are loaded on demand.
+
+    It stands in for the `Fabric` object: `TF.api.F.year` and `TF.api.Fs("year")`
+    load the feature `year` if it has not been loaded yet, and then return it,
+    likewise for edge features under `E` and `Es`.
+    Everything else is passed on to the `Fabric` object and its API.
+
+    Parameters
+    ----------
+    TF: object
+        The `Fabric` object, after a first `load()`.
+    loadable: iterable of string
+        The features that can be loaded.
+    """
+
+    def __init__(self, TF, loadable):
+        self.TF = TF
+        self.loadable = set(loadable)
+        self.api = LazyApi(self)
+
+    def get(self, kind, feat):
+        """A feature of the API, under `F` or `E`, loaded if needed."""
+        if feat in self.loadable and not hasattr(getattr(self.TF.api, kind), feat):
+            self.TF.load(feat, add=True, silent=True)
+        return getattr(getattr(self.TF.api, kind), feat)
+
+    def __getattr__(self, name):
+        return getattr(self.TF, name)
+
+
+class LazyApi:
+    """The API of a `LazyTf`, with lazy `F` and `E`."""
+
+    def __init__(self, lazyTf):
+        self.lazyTf = lazyTf
+        self.F = LazyFeatures(lazyTf, "F")
+        self.E = LazyFeatures(lazyTf, "E")
+
+    def Fs(self, feat):
+        return getattr(self.F, feat)
+
+    def Es(self, feat):
+        return getattr(self.E, feat)
+
+    def __getattr__(self, name):
+        return getattr(self.lazyTf.TF.api, name)
+
+
+class LazyFeatures:
+    """The node (`F`) or edge (`E`) features of a `LazyTf`."""
+
+    def __init__(self, lazyTf, kind):
+        self.lazyTf = lazyTf
+        self.kind = kind
+
+    def __getattr__(self, feat):
+        return self.lazyTf.get(self.kind, feat)
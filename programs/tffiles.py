@@ -0,0 +1,229 @@
+import os
+import json
+import hashlib
+from datetime import datetime, timezone
+from itertools import groupby
+
+from config import Config
+
+
+# increase this when the TF files change for the same source files,
+# so that an incremental conversion after it converts everything
+
+STATE_VERSION = 1
+
+
+def stateFile(volume, base=None):
+    """The file with the state of the last direct TF conversion of a volume."""
+    C = Config(base=base)
+    return f"{C.local}/tfstate/{C.volumeName(volume)}.json"
+
+
+def readState(path):
+    """Read the state of the last conversion, or None if there is none (yet)."""
+    if not os.path.exists(path):
+        return None
+    with open(path) as fh:
+        state = json.load(fh)
+    if state.get("version", None) != STATE_VERSION:
+        return None
+    for kind in ("pageNodes", "words", "heads"):
+        state[kind] = {int(page): x for (page, x) in state[kind].items()}
+    return state
+
+
+def writeState(path, state):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as fh:
+        json.dump(dict(version=STATE_VERSION) | state, fh)
+
+
+def removeState(path):
+    if os.path.exists(path):
+        os.remove(path)
+
+
+def pageHashes(srcFile, headerFile):
+    """Hash the rows of the word file and the head line file per page.
+
+    The first column of the word file, the word number, is left out, so that
+    a change on one page does not change the hashes of the pages after it.
+    Of the head line file only the fields that end up in TF count.
+
+    Returns
+    -------
+    tuple
+        The hashes of the words and of the head lines, keyed by page number.
+    """
+    words = {}
+    with open(srcFile) as fh:
+        next(fh)
+        rows = (line.split("\t", 1)[1] for line in fh)
+        for (page, lines) in groupby(rows, key=lambda row: row.split("\t", 1)[0]):
+            sha = hashlib.sha1()
+            for line in lines:
+                sha.update(line.encode("utf8"))
+            words[int(page)] = sha.hexdigest()
+
+    heads = {}
+    with open(headerFile) as fh:
+        next(fh)
+        for line in fh:
+            fields = line.rstrip("\n").split("\t")
+            data = "\t".join(fields[1:2] + fields[3:])
+            heads[int(fields[0])] = hashlib.sha1(data.encode("utf8")).hexdigest()
+
+    return (words, heads)
+
+
+def tfHeader(kind, meta, dateWritten=None):
+    """The header of a TF file, with the metadata in the order of `tf.core.data`."""
+    if dateWritten is None:
+        dateWritten = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+    return (
+        f"@{kind}\n"
+        + "".join(f"@{key}={meta[key]}\n" for key in sorted(meta))
+        + f"@writtenBy=Text-Fabric\n@dateWritten={dateWritten}\n\n"
+    )
+
+
+class TfFile:
+    """A TF file being written, see `TfFiles.open()`.
+
+    The contents go to a new file next to the existing one, and are hashed,
+    apart from the time of writing.
+    """
+
+    def __init__(self, files, feat, kind, meta):
+        self.files = files
+        self.feat = feat
+        self.path = f"{files.dest}/{feat}.tf"
+        self.newPath = f"{self.path}.new"
+        self.sha = hashlib.sha1(tfHeader(kind, meta, dateWritten="").encode("utf8"))
+        self.fh = open(self.newPath, "w", encoding="utf8")
+        self.fh.write(tfHeader(kind, meta))
+
+    def write(self, text):
+        self.sha.update(text.encode("utf8"))
+        self.fh.write(text)
+
+    def writelines(self, lines):
+        for text in lines:
+            self.write(text)
+
+    def close(self, keep=True):
+        """Close the file and put it in place, unless the old one is the same.
+
+        Parameters
+        ----------
+        keep: boolean, optional True
+            Whether the file should be there at all.
+        """
+        if self.fh is None:
+            return
+        self.fh.close()
+        self.fh = None
+        h = self.sha.hexdigest()
+        self.files.finish(self.feat, self.path, self.newPath, h, keep)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, *exc):
+        if excType is None:
+            self.close()
+        elif self.fh is not None:
+            self.fh.close()
+            self.fh = None
+            os.remove(self.newPath)
+
+
+class TfFiles:
+    """The TF files of a volume, written so that unchanged files stay as they are.
+
+    A file is kept if its contents (apart from the time of writing) have the same
+    hash as in the last conversion, and it has not been touched since:
+    its size and modification time are also recorded.
+    Text-Fabric then does not have to recompile the kept features either.
+
+    Parameters
+    ----------
+    dest: string
+        The directory of the TF files.
+    previous: dict, optional None
+        The hash, size and modification time of the files of the last conversion,
+        keyed by feature. If None, all files are written.
+
+    The writer fills in `pageNodes`: the node of every page.
+    """
+
+    def __init__(self, dest, previous=None):
+        self.dest = dest
+        self.previous = {} if previous is None else previous
+        self.current = {}
+        self.status = {}
+        self.pageNodes = {}
+        os.makedirs(dest, exist_ok=True)
+
+    def open(self, feat, kind, meta):
+        return TfFile(self, feat, kind, meta)
+
+    def write(self, feat, kind, meta, lines):
+        """Write a TF file: a header with metadata, then the data lines."""
+        with self.open(feat, kind, meta) as fh:
+            fh.writelines(lines)
+
+    def intact(self, feat):
+        """Whether the file of a feature is as the last conversion left it."""
+        entry = self.previous.get(feat, None)
+        path = f"{self.dest}/{feat}.tf"
+        if entry is None or not os.path.exists(path):
+            return False
+        info = os.stat(path)
+        return [info.st_size, info.st_mtime_ns] == entry[1:]
+
+    def finish(self, feat, path, newPath, h, keep):
+        if not keep:
+            os.remove(newPath)
+            self.remove(feat)
+            return
+        entry = self.previous.get(feat, None)
+        if entry is not None and entry[0] == h and self.intact(feat):
+            os.remove(newPath)
+            self.current[feat] = entry
+            self.status[feat] = "kept"
+        else:
+            os.replace(newPath, path)
+            info = os.stat(path)
+            self.current[feat] = [h, info.st_size, info.st_mtime_ns]
+            self.status[feat] = "written"
+
+    def remove(self, feat):
+        path = f"{self.dest}/{feat}.tf"
+        if os.path.exists(path):
+            os.remove(path)
+            self.status[feat] = "removed"
+        self.current.pop(feat, None)
+
+    def removeRest(self):
+        """Remove the files of the last conversion that have not been written now."""
+        for feat in self.previous:
+            if feat not in self.status:
+                self.remove(feat)
+
+    def state(self):
+        """The entries of all files, including the ones not touched in this run."""
+        return {
+            feat: entry
+            for (feat, entry) in (self.previous | self.current).items()
+            if self.status.get(feat, None) != "removed"
+        }
+
+    def report(self):
+        byStatus = {}
+        for (feat, status) in sorted(self.status.items()):
+            byStatus.setdefault(status, []).append(feat)
+        for status in ("written", "removed", "kept"):
+            feats = byStatus.get(status, [])
+            if feats:
+                print(f"{status:<7}: {len(feats):>2} x {', '.join(feats)}")
@@ -0,0 +1,221 @@
+import os
+from array import array
+from itertools import groupby
+
+from config import Config
+
+
+# The box file of a volume has a row for every line of its word file,
+# with the page number and the box (left, top, right, bottom) of the word.
+# All five values are stored as unsigned 16 bit integers, like the character
+# boxes in `chars.Chars`, so a row takes 10 bytes.
+# The rows come after a header of the format marker and version.
+
+BOXES_MAGIC = b"DRWB"
+BOXES_VERSION = 1
+BOXES_TYPECODE = "H"
+ROW_SIZE = 5
+
+# the writer flushes its buffer after this many values
+
+FLUSH_SIZE = 1 << 16
+
+# the side of the square cells of the spatial index of a page, in pixels
+
+GRID_CELL = 128
+
+
+def boxesFile(volume, base=None):
+    """The path of the box file of a volume, next to its word file."""
+    C = Config(base=base)
+    return f"{C.local}/{C.volumeName(volume)}_words.boxes"
+
+
+class BoxWriter:
+    """Write the boxes of words to a box file, in the order of the word file.
+
+    Rows are buffered and written in batches, so the words do not have to be
+    kept in memory.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.fh = open(path, "wb")
+        self.fh.write(BOXES_MAGIC + bytes((BOXES_VERSION,)))
+        self.buffer = array(BOXES_TYPECODE)
+        self.n = 0
+
+    def add(self, page, box):
+        """Add the row of a word; box is the tuple (left, top, right, bottom)."""
+        buffer = self.buffer
+        buffer.append(page)
+        buffer.extend(box)
+        self.n += 1
+        if len(buffer) >= FLUSH_SIZE:
+            self.flush()
+
+    def flush(self):
+        self.buffer.tofile(self.fh)
+        self.buffer = array(BOXES_TYPECODE)
+
+    def close(self):
+        if self.fh is not None:
+            self.flush()
+            self.fh.close()
+            self.fh = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class WordBoxes:
+    """The boxes of the words of a volume, with a spatial index per page.
+
+    Word numbers are the positions of the words in the word file, starting at 0.
+    Rectangles and boxes are tuples (left, top, right, bottom), points are
+    tuples (x, y), in the pixel coordinates of the page images.
+
+    The boxes are kept as arrays of unsigned 16 bit integers, one per field.
+    The index of a page is a uniform grid of square cells of `GRID_CELL` pixels,
+    with the words whose boxes overlap each cell.
+    It is built when the page is queried for the first time.
+
+    Parameters
+    ----------
+    path: string
+        The box file, as written by `BoxWriter`.
+    """
+
+    def __init__(self, path):
+        with open(path, "rb") as fh:
+            header = fh.read(len(BOXES_MAGIC) + 1)
+            if header[0:-1] != BOXES_MAGIC or header[-1] != BOXES_VERSION:
+                raise ValueError(f"Not a box file of version {BOXES_VERSION}: {path}")
+            data = array(BOXES_TYPECODE)
+            data.frombytes(fh.read())
+
+        self.page = data[0::ROW_SIZE]
+        self.left = data[1::ROW_SIZE]
+        self.top = data[2::ROW_SIZE]
+        self.right = data[3::ROW_SIZE]
+        self.bottom = data[4::ROW_SIZE]
+
+        # the words of a page are consecutive in the word file
+
+        self.pages = {}
+        w = 0
+        for (page, ws) in groupby(self.page):
+            n = sum(1 for _ in ws)
+            self.pages[page] = (w, w + n)
+            w += n
+
+        self.grids = {}
+
+    def __len__(self):
+        return len(self.page)
+
+    def box(self, w):
+        """The box of word w."""
+        return (self.left[w], self.top[w], self.right[w], self.bottom[w])
+
+    def grid(self, page):
+        """The spatial index of a page: the word numbers per grid cell.
+
+        Returns
+        -------
+        dict
+            Keyed by (column, row) of the cell, valued by the list of words,
+            in the order of the word file.
+        """
+        grid = self.grids.get(page, None)
+        if grid is not None:
+            return grid
+
+        grid = {}
+        (start, end) = self.pages.get(page, (0, 0))
+        for w in range(start, end):
+            for cx in range(self.left[w] // GRID_CELL, self.right[w] // GRID_CELL + 1):
+                for cy in range(
+                    self.top[w] // GRID_CELL, self.bottom[w] // GRID_CELL + 1
+                ):
+                    grid.setdefault((cx, cy), []).append(w)
+        self.grids[page] = grid
+        return grid
+
+    def wordsIn(self, page, rect):
+        """The words on a page whose boxes overlap a rectangle.
+
+        Parameters
+        ----------
+        page: integer
+            The page number.
+        rect: tuple
+            The rectangle (left, top, right, bottom).
+
+        Returns
+        -------
+        list
+            The word numbers, in the order of the word file.
+        """
+        (rLeft, rTop, rRight, rBottom) = rect
+        grid = self.grid(page)
+        (left, top, right, bottom) = (self.left, self.top, self.right, self.bottom)
+
+        result = set()
+        for cx in range(max(rLeft, 0) // GRID_CELL, max(rRight, 0) // GRID_CELL + 1):
+            for cy in range(
+                max(rTop, 0) // GRID_CELL, max(rBottom, 0) // GRID_CELL + 1
+            ):
+                for w in grid.get((cx, cy), ()):
+                    if (
+                        left[w] <= rRight
+                        and right[w] >= rLeft
+                        and top[w] <= rBottom
+                        and bottom[w] >= rTop
+                    ):
+                        result.add(w)
+        return sorted(result)
+
+    def wordAt(self, page, point):
+        """The word on a page whose box contains a point.
+
+        Parameters
+        ----------
+        page: integer
+            The page number.
+        point: tuple
+            The point (x, y).
+
+        Returns
+        -------
+        integer or None
+            The word number; if boxes overlap, the first of them in the word file;
+            None if there is no word at the point.
+        """
+        (x, y) = point
+        if x < 0 or y < 0:
+            return None
+        (left, top, right, bottom) = (self.left, self.top, self.right, self.bottom)
+
+        for w in self.grid(page).get((x // GRID_CELL, y // GRID_CELL), ()):
+            if left[w] <= x <= right[w] and top[w] <= y <= bottom[w]:
+                return w
+        return None
+
+
+def wordBoxes(volume, base=None):
+    """Load the box file of a volume, see `WordBoxes`.
+
+    Returns
+    -------
+    WordBoxes or None
+        None if the volume has no box file (yet).
+    """
+    path = boxesFile(volume, base=base)
+    if not os.path.exists(path):
+        print(f"No word boxes for volume {volume}: run the conversion first")
+        return None
+    return WordBoxes(path)
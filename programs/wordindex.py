@@ -0,0 +1,220 @@
+import os
+import mmap
+import collections
+from array import array
+from collections.abc import Mapping
+from itertools import accumulate
+
+from tf.core.helpers import unexpanduser, valueFromTf
+
+from config import Config
+
+
+# The word index file has a header of four unsigned 32 bit integers:
+# the format marker, the version, the number of distinct words and the number
+# of occurrences. Then come the offsets (one more than there are words),
+# the positions, and the words themselves, UTF-8, separated by newlines.
+# The integers are in the byte order of the machine, like the arrays.
+
+INDEX_MAGIC = b"DRWI"
+INDEX_VERSION = 1
+INDEX_TYPECODE = "I"
+HEADER_SIZE = 16
+
+
+def wordIndexFile(volume, base=None, feature="letters"):
+    """The path of the word index of a feature of a volume, next to its TF files."""
+    C = Config(base=base)
+    return f"{C.tfDir}/{C.volumeNameNum(volume)}/{C.tfVersion}/.wordindex.{feature}"
+
+
+class WordIndex(Mapping):
+    """The occurrences of the words of a text, in compressed sparse rows.
+
+    Every distinct word gets a number, in the order of its first occurrence.
+    The positions of all occurrences are in one array, sorted by word number and
+    then by position; the occurrences of word `i` are between `offsets[i]` and
+    `offsets[i + 1]`.
+
+    It is a read-only mapping from words to their positions, so it can take the
+    place of a `defaultdict(list)` of occurrences, with the same order of words.
+    The positions of a word are a `memoryview` into the array, not a list,
+    so there are no objects per word apart from the word itself.
+
+    Parameters
+    ----------
+    words: list of string
+        The distinct words, by number.
+    offsets: array or memoryview of unsigned integer
+        Where the positions of each word start, and where the last ones end.
+    positions: array or memoryview of unsigned integer
+        The positions of the occurrences.
+    """
+
+    def __init__(self, words, offsets, positions):
+        self.words = words
+        self.offsets = memoryview(offsets)
+        self.positions = memoryview(positions)
+        self.wordId = {word: i for (i, word) in enumerate(words)}
+        self.mm = None
+
+    @classmethod
+    def fromWords(cls, words, start=0):
+        """Index a sequence of words.
+
+        Parameters
+        ----------
+        words: iterable of string
+            The words of a text, in order.
+        start: integer, optional 0
+            The position of the first word, e.g. 1 for the slots of TF.
+        """
+        # a new word gets the number of words seen before it
+
+        wordId = {}
+        ids = array(INDEX_TYPECODE, [wordId.setdefault(w, len(wordId)) for w in words])
+
+        counts = collections.Counter(ids)
+        offsets = array(INDEX_TYPECODE, [0])
+        offsets.extend(accumulate(counts[i] for i in range(len(wordId))))
+
+        # a stable sort keeps the positions of each word in increasing order
+
+        order = sorted(range(len(ids)), key=ids.__getitem__)
+        positions = array(
+            INDEX_TYPECODE, order if start == 0 else (p + start for p in order)
+        )
+        return cls(list(wordId), offsets, positions)
+
+    @classmethod
+    def load(cls, path):
+        """Map a word index file into memory, see `save()`."""
+        with open(path, "rb") as fh:
+            mm = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(mm)
+        header = view[0:HEADER_SIZE].cast(INDEX_TYPECODE)
+        if bytes(view[0:4]) != INDEX_MAGIC or header[1] != INDEX_VERSION:
+            header.release()
+            view.release()
+            mm.close()
+            raise ValueError(f"Not a word index of version {INDEX_VERSION}: {path}")
+        (nWords, nOccs) = (header[2], header[3])
+        header.release()
+
+        size = array(INDEX_TYPECODE).itemsize
+        offsetsEnd = HEADER_SIZE + (nWords + 1) * size
+        positionsEnd = offsetsEnd + nOccs * size
+        words = str(view[positionsEnd:], "utf8").split("\n") if nWords else []
+
+        index = cls(
+            words,
+            view[HEADER_SIZE:offsetsEnd].cast(INDEX_TYPECODE),
+            view[offsetsEnd:positionsEnd].cast(INDEX_TYPECODE),
+        )
+        index.mm = mm
+        return index
+
+    def save(self, path):
+        """Write the index to a file, see `load()`.
+
+        The file is replaced as a whole, so that other processes that have mapped
+        the old file keep seeing the old index.
+        """
+        header = array(
+            INDEX_TYPECODE, (INDEX_VERSION, len(self.words), len(self.positions))
+        )
+        newPath = f"{path}.new"
+        with open(newPath, "wb") as fh:
+            fh.write(INDEX_MAGIC)
+            fh.write(header.tobytes())
+            fh.write(self.offsets.tobytes())
+            fh.write(self.positions.tobytes())
+            fh.write("\n".join(self.words).encode("utf8"))
+        os.replace(newPath, path)
+
+    def freq(self, word):
+        """The number of occurrences of a word, 0 if it does not occur."""
+        i = self.wordId.get(word, None)
+        if i is None:
+            return 0
+        offsets = self.offsets
+        return offsets[i + 1] - offsets[i]
+
+    def occs(self, word):
+        """The positions of a word, empty if it does not occur."""
+        i = self.wordId.get(word, None)
+        if i is None:
+            return self.positions[0:0]
+        offsets = self.offsets
+        return self.positions[offsets[i] : offsets[i + 1]]
+
+    def freqs(self):
+        """Iterate over the words and their numbers of occurrences."""
+        offsets = self.offsets
+        for (i, word) in enumerate(self.words):
+            yield (word, offsets[i + 1] - offsets[i])
+
+    @property
+    def total(self):
+        return len(self.positions)
+
+    def __getitem__(self, word):
+        i = self.wordId[word]
+        offsets = self.offsets
+        return self.positions[offsets[i] : offsets[i + 1]]
+
+    def __contains__(self, word):
+        return word in self.wordId
+
+    def __iter__(self):
+        return iter(self.words)
+
+    def __len__(self):
+        return len(self.words)
+
+
+def readFeature(path):
+    """The values of a TF node feature, in the order of the nodes.
+
+    Only for features with a value for every node from 1 on, such as `letters`.
+    """
+    with open(path, encoding="utf8") as fh:
+        for line in fh:
+            if not line.startswith("@"):
+                break
+        for line in fh:
+            value = line.rstrip("\n")
+            if "\t" in value:
+                value = value.split("\t", 1)[1]
+            yield valueFromTf(value) if "\\" in value else value
+
+
+def wordIndex(volume, base=None, feature="letters"):
+    """The word index of the slots of a volume, see `WordIndex`.
+
+    The words are the values of a feature, `letters` by default;
+    the positions are slot numbers.
+    The index is saved next to the TF files, and made again from the feature file
+    when that is newer; otherwise it is only mapped into memory.
+
+    Returns
+    -------
+    WordIndex or None
+        None if the volume has no TF (yet).
+    """
+    C = Config(base=base)
+    featurePath = f"{C.tfDir}/{C.volumeNameNum(volume)}/{C.tfVersion}/{feature}.tf"
+    path = wordIndexFile(volume, base=base, feature=feature)
+
+    if not os.path.exists(featurePath):
+        print(f"No TF feature {unexpanduser(featurePath)}: run the conversion first")
+        return None
+
+    if os.path.exists(path) and os.path.getmtime(path) >= os.path.getmtime(
+        featurePath
+    ):
+        return WordIndex.load(path)
+
+    index = WordIndex.fromWords(readFeature(featurePath), start=1)
+    index.save(path)
+    return index